@@ -0,0 +1,66 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core import serializers
+from django.db import router, transaction
+from django.db.models import prefetch_related_objects
+from django.db.models.deletion import Collector
+from django.utils import timezone
+from .models import Notification, Report, Prediction, FeedEvent, ArchivedRecord
+from .planner import plan_for
+from .serializers import ReportSerializer, PredictionSerializer
+
+# Oldest first so a report's predictions and notifications are usually gone before the report is
+ROOTS = (Notification, Prediction, Report)
+# Kept the way the detail views return them, everything else as plain field values
+REPRESENTATIONS = {
+	Report: ReportSerializer,
+	Prediction: PredictionSerializer,
+}
+
+# Create your archive helpers here.
+def records(model, objects, now):
+	serializer = REPRESENTATIONS.get(model)
+	if serializer is not None:
+		select_related, prefetch_related = plan_for(serializer)
+		prefetch_related_objects(objects, *select_related, *prefetch_related)
+		items = serializer(objects, many=True).data
+	else:
+		items = [item['fields'] for item in serializers.serialize('python', objects)]
+	return [
+		ArchivedRecord(
+			kind=model._meta.model_name,
+			object_id=obj.pk,
+			timestamp=getattr(obj, 'timestamp', None) or now,
+			data=dict(item)
+		)
+		for obj, item in zip(objects, items)
+	]
+
+def archive(model, before, chunk_size):
+	# Moves one chunk of model rows older than before, with every row their deletion would cascade to
+	now = timezone.now()
+	using = router.db_for_write(model)
+	with transaction.atomic(using=using):
+		roots = list(model.objects.select_for_update(skip_locked=True).filter(timestamp__lt=before).order_by('timestamp', 'id')[:chunk_size])
+		if not roots:
+			return 0
+		collector = Collector(using=using)
+		collector.collect(roots)
+		archived = []
+		for related, objects in collector.data.items():
+			archived += records(related, list(objects), now)
+		# Rows Django deletes without loading them, such as the notification recipients
+		for queryset in collector.fast_deletes:
+			archived += records(queryset.model, list(queryset), now)
+		ArchivedRecord.objects.bulk_create(archived, batch_size=1000, ignore_conflicts=True)
+		collector.delete()
+	return len(roots)
+
+def prune_feed_events(chunk_size):
+	before = timezone.now() - timedelta(hours=settings.FEED_EVENT_RETENTION_HOURS)
+	ids = list(FeedEvent.objects.filter(timestamp__lt=before).order_by('id').values_list('id', flat=True)[:chunk_size])
+	return FeedEvent.objects.filter(id__in=ids).delete()[0]
+
+def lookup(model, id):
+	# The archived representation of a row no longer in the hot table, or None
+	return ArchivedRecord.objects.filter(kind=model._meta.model_name, object_id=id).values_list('data', flat=True).first()
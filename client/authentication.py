@@ -0,0 +1,78 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from django.conf import settings
+from rest_framework.authtoken.models import Token
+from rest_framework.response import Response
+
+# Create your authentication here.
+class TokenCache:
+	# Least recently used token -> user entries, each valid for ttl seconds
+	def __init__(self, size, ttl):
+		self.size = size
+		self.ttl = ttl
+		self.entries = OrderedDict()
+		self.lock = threading.Lock()
+
+	def get(self, key):
+		with self.lock:
+			entry = self.entries.get(key)
+			if entry is None:
+				return None
+			user, expires = entry
+			if expires < time.monotonic():
+				del self.entries[key]
+				return None
+			self.entries.move_to_end(key)
+		# Each request gets its own copy, so changes made by a view never leak into the cache
+		return copy.deepcopy(user)
+
+	def set(self, key, user):
+		if self.size <= 0:
+			return
+		with self.lock:
+			self.entries[key] = (copy.deepcopy(user), time.monotonic() + self.ttl)
+			self.entries.move_to_end(key)
+			while len(self.entries) > self.size:
+				self.entries.popitem(last=False)
+
+	def delete(self, key):
+		with self.lock:
+			self.entries.pop(key, None)
+
+	def delete_user(self, user_id):
+		with self.lock:
+			for key in [key for key, (user, _) in self.entries.items() if user.id == user_id]:
+				del self.entries[key]
+
+	def clear(self):
+		with self.lock:
+			self.entries.clear()
+
+tokens = TokenCache(settings.TOKEN_CACHE_SIZE, settings.TOKEN_CACHE_TTL)
+
+def authenticate_token(key):
+	user = tokens.get(key)
+	if user is None:
+		token = Token.objects.select_related('user').filter(key=key).first()
+		if token is None:
+			return None
+		user = token.user
+		tokens.set(key, user)
+	return user
+
+def token_required(view):
+	# Resolves ?token= into request.user, answering like the views always have when it is missing or unknown
+	@wraps(view)
+	def wrapper(request, *args, **kwargs):
+		key = request.GET.get('token')
+		if not key:
+			return Response({ 'data': 'Invalid parameters', 'status': False })
+		user = authenticate_token(key)
+		if user is None:
+			return Response({ 'data': 'Invalid token', 'status': False })
+		request.user = user
+		return view(request, *args, **kwargs)
+	return wrapper
@@ -0,0 +1,90 @@
+import asyncio
+import threading
+import time
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from .workers import Worker
+
+# Create your broadcasters here.
+async def publish(frames):
+	channel_layer = get_channel_layer()
+	# Sent concurrently so the Redis round trips overlap
+	await asyncio.gather(*[
+		channel_layer.group_send(group, { 'type': handler, 'events': events })
+		for (group, handler), events in frames
+	])
+
+class Broadcaster(Worker):
+	# Events for the same group and handler are held until window seconds pass without a new one,
+	# but never longer than max_latency, then go out as one {'type': handler, 'events': [...]} message
+	name = 'broadcaster'
+
+	def __init__(self, window, max_latency):
+		super().__init__()
+		self.window = window
+		self.max_latency = max_latency
+
+	def setup(self):
+		self.condition = threading.Condition()
+		self.pending = {}
+
+	def send(self, group, handler, events, key=None, merge=None):
+		# key(event) identifies the item an event is about, a newer event for the same item replaces
+		# the pending one, combined by merge(old, new) when given
+		if self.window <= 0:
+			async_to_sync(publish)([((group, handler), list(events))])
+			return
+		self.start()
+		now = time.monotonic()
+		with self.condition:
+			batch = self.pending.get((group, handler))
+			if batch is None:
+				batch = self.pending[(group, handler)] = { 'events': {}, 'first': now }
+			for event in events:
+				event_key = key(event) if key else object()
+				previous = batch['events'].pop(event_key, None)
+				batch['events'][event_key] = merge(previous, event) if merge and previous is not None else event
+			batch['last'] = now
+			self.condition.notify()
+
+	def due(self, now):
+		return [
+			target for target, batch in self.pending.items()
+			if now - batch['last'] >= self.window or now - batch['first'] >= self.max_latency
+		]
+
+	def take(self, targets):
+		return [(target, list(self.pending.pop(target)['events'].values())) for target in targets]
+
+	def next_frames(self):
+		with self.condition:
+			while True:
+				while not self.pending:
+					self.condition.wait()
+				now = time.monotonic()
+				targets = self.due(now)
+				if targets:
+					return self.take(targets)
+				deadline = min(min(batch['last'] + self.window, batch['first'] + self.max_latency) for batch in self.pending.values())
+				self.condition.wait(deadline - now)
+
+	def flush(self):
+		# Sends whatever is pending right away, commands call it before they exit
+		if not self.started():
+			return
+		with self.condition:
+			frames = self.take(list(self.pending))
+		if frames:
+			async_to_sync(publish)(frames)
+
+	def run(self):
+		while True:
+			frames = self.next_frames()
+			try:
+				async_to_sync(publish)(frames)
+			except Exception:
+				# Pushes are best effort, clients resume from their last sequence number
+				pass
+
+broadcaster = Broadcaster(settings.BROADCAST_WINDOW_MS / 1000, settings.BROADCAST_MAX_LATENCY_MS / 1000)
@@ -4,35 +4,117 @@ import django
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'server.settings')
 django.setup()
 
+from channels.db import database_sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
+from django.conf import settings
+from urllib.parse import parse_qs
+import asyncio
 import json
+from . import feed, ingest
+from .authentication import authenticate_token
 
 # Create your consumers here.
-class ReportConsumer(AsyncWebsocketConsumer):
+class FeedConsumer(AsyncWebsocketConsumer):
+	# Pushes one frame per batch of events; ?since=<seq> resumes after a reconnect
+	stream = None
+
 	async def connect(self):
-		self.group_name = 'reports'
+		self.group_name = self.stream
 		await self.channel_layer.group_add(self.group_name, self.channel_name)
 		await self.accept()
+		since = parse_qs(self.scope['query_string'].decode()).get('since')
+		if since and since[0].isdigit():
+			data = await database_sync_to_async(feed.replay)(self.stream, int(since[0]))
+		else:
+			data = { 'seq': await database_sync_to_async(feed.latest)(self.stream) }
+		await self.send(text_data=json.dumps(data))
 
 	async def disconnect(self, close_code):
 		await self.channel_layer.group_discard(self.group_name, self.channel_name)
 
+	async def send_events(self, event):
+		await self.send(text_data=json.dumps({ 'events': event['events'] }))
+
+class ReportConsumer(FeedConsumer):
+	stream = 'reports'
+
 	async def send_report(self, event):
-		data = event['message']
-		await self.send(text_data=json.dumps({ 'reports': data }))
+		await self.send_events(event)
+
+class PredictionConsumer(FeedConsumer):
+	stream = 'predictions'
+
+	async def send_prediction(self, event):
+		await self.send_events(event)
 
-class PredictionConsumer(AsyncWebsocketConsumer):
+class IngestConsumer(AsyncWebsocketConsumer):
+	# Devices send {'seq': n, 'report': {...}} and get {'ack': n, 'results': [...], 'credit': k} per flushed batch.
+	# 'credit' is how many more readings may be sent; readings sent without credit are refused.
+	# Unacknowledged readings are dropped on disconnect, the device sends them again after reconnecting.
 	async def connect(self):
-		self.group_name = 'predictions'
-		await self.channel_layer.group_add(self.group_name, self.channel_name)
+		token = parse_qs(self.scope['query_string'].decode()).get('token')
+		self.user = await database_sync_to_async(authenticate_token)(token[0]) if token else None
+		if self.user is None:
+			await self.close(code=4001)
+			return
+		self.buffer = []
+		self.credit = settings.INGEST_CREDIT
+		self.flushing = asyncio.Lock()
+		self.timer = None
 		await self.accept()
+		await self.send(text_data=json.dumps({ 'credit': self.credit }))
 
 	async def disconnect(self, close_code):
-		await self.channel_layer.group_discard(self.group_name, self.channel_name)
+		if getattr(self, 'timer', None) is not None:
+			self.timer.cancel()
 
-	async def send_prediction(self, event):
-		data = event['message']
-		await self.send(text_data=json.dumps({ 'predictions': data }))
+	async def receive(self, text_data=None, bytes_data=None):
+		try:
+			message = json.loads(text_data or bytes_data)
+			seq, report = message['seq'], message['report']
+		except (TypeError, ValueError, KeyError):
+			await self.send(text_data=json.dumps({ 'error': 'Invalid message' }))
+			return
+		if self.credit <= 0:
+			await self.send(text_data=json.dumps({ 'seq': seq, 'error': 'No credit' }))
+			return
+		self.credit -= 1
+		self.buffer.append((seq, report))
+		if len(self.buffer) >= settings.INGEST_FLUSH_SIZE:
+			self.schedule(0)
+		elif self.timer is None:
+			self.schedule(settings.INGEST_FLUSH_MS / 1000)
+
+	def schedule(self, delay):
+		if self.timer is not None:
+			self.timer.cancel()
+		self.timer = asyncio.create_task(self.flush_after(delay))
+
+	async def flush_after(self, delay):
+		await asyncio.sleep(delay)
+		self.timer = None
+		await self.flush()
+
+	async def flush(self):
+		# One batch at a time; credit only comes back once a batch is stored
+		async with self.flushing:
+			batch, self.buffer = self.buffer[:settings.INGEST_FLUSH_SIZE], self.buffer[settings.INGEST_FLUSH_SIZE:]
+			if not batch:
+				return
+			try:
+				results = await database_sync_to_async(ingest.create_reports)(self.user, [report for _, report in batch])
+			except Exception:
+				# create_reports absorbs failures after the commit, so nothing of this batch was stored.
+				# Refused rather than lost, the device may send them again
+				results = [{ 'error': 'Not stored' }] * len(batch)
+			self.credit += len(batch)
+			await self.send(text_data=json.dumps({
+				'ack': batch[-1][0],
+				'results': [{ 'seq': seq, **result } for (seq, _), result in zip(batch, results)],
+				'credit': len(batch),
+			}))
+			if self.buffer and self.timer is None:
+				self.schedule(0 if len(self.buffer) >= settings.INGEST_FLUSH_SIZE else settings.INGEST_FLUSH_MS / 1000)
 
 class NotificationConsumer(AsyncWebsocketConsumer):
 	async def connect(self):
@@ -54,6 +136,6 @@ class NotificationConsumer(AsyncWebsocketConsumer):
 		for group in self.groups_to_join:
 			await self.channel_layer.group_discard(group, self.channel_name)
 
-	async def send_notification(self, event):
-		data = event['message']
-		await self.send(text_data=json.dumps({ 'notifications': data }))
+	async def send_notifications(self, event):
+		# Every notification of one broadcast window in a single frame
+		await self.send(text_data=json.dumps({ 'notifications': event['events'] }))
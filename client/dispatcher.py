@@ -0,0 +1,46 @@
+from django.db import transaction
+from .broadcast import broadcaster
+from .models import Notification, NotificationOutbox
+
+# Create your dispatchers here.
+def dispatch(batch_size):
+	with transaction.atomic():
+		entries = list(NotificationOutbox.objects.select_for_update(skip_locked=True).order_by('id')[:batch_size])
+		if not entries:
+			return 0
+		notifications = Notification.objects.bulk_create([
+			Notification(
+				actor_id=entry.actor_id,
+				report_id=entry.report_id,
+				report_like_id=entry.report_like_id,
+				prediction_id=entry.prediction_id,
+				prediction_like_id=entry.prediction_like_id,
+				feedback_id=entry.feedback_id,
+				action_type=entry.action_type,
+				message=entry.message,
+				timestamp=entry.timestamp,
+				broadcast=entry.broadcast
+			)
+			for entry in entries
+		])
+		Recipient = Notification.user.through
+		Recipient.objects.bulk_create(
+			[
+				Recipient(notification_id=notification.id, user_id=user_id)
+				for notification, entry in zip(notifications, entries)
+				if not entry.broadcast
+				for user_id in entry.recipients
+				if user_id
+			],
+			ignore_conflicts=True
+		)
+		NotificationOutbox.objects.filter(id__in=[entry.id for entry in entries]).delete()
+	messages = {}
+	for entry in entries:
+		groups = ['notifications'] if entry.broadcast else [f'user_{user_id}' for user_id in entry.recipients if user_id]
+		for group in groups:
+			messages.setdefault(group, []).append({ 'data': entry.message })
+	# Pushes are best effort, the notifications themselves are already committed
+	for group, events in messages.items():
+		broadcaster.send(group, 'send_notifications', events)
+	return len(entries)
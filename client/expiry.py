@@ -0,0 +1,38 @@
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from . import feed
+from .models import Report, LocationSentiment
+from .planner import plan
+from .serializers import ReportSerializer
+
+# Create your expiry helpers here.
+def due(now):
+	# Active reports past the TTL of their type
+	ttls = settings.REPORT_TTL_BY_TYPE
+	condition = Q(timestamp__lt=now - timedelta(hours=settings.REPORT_TTL_HOURS)) & ~Q(report_type__in=list(ttls))
+	for report_type, hours in ttls.items():
+		condition |= Q(report_type=report_type, timestamp__lt=now - timedelta(hours=hours))
+	return Report.objects.filter(condition, status='active')
+
+def expire(batch_size):
+	now = timezone.now()
+	with transaction.atomic():
+		# Oldest first through the partial index on active reports; rows another sweeper holds are skipped
+		reports = list(
+			due(now).select_for_update(skip_locked=True)
+			.order_by('timestamp', 'id')
+			.only('id', 'location', 'timestamp', 'status', 'sentiment_label')[:batch_size]
+		)
+		if not reports:
+			return 0
+		Report.objects.filter(id__in=[report.id for report in reports]).update(status='expired')
+		# Still active in memory, so they are taken off the counters they were added to
+		LocationSentiment.objects.record(reports, -1)
+	# Only reports still inside the 24h feeds need a delta
+	recent = [report.id for report in reports if report.timestamp >= now - timedelta(hours=24)]
+	if recent:
+		feed.push('reports', 'updated', plan(Report.objects.filter(id__in=recent).order_by('-timestamp', '-id'), ReportSerializer))
+	return len(reports)
@@ -0,0 +1,110 @@
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from . import geo, likes
+from .broadcast import broadcaster
+from .models import Report, Prediction, FeedEvent
+from .pagination import paginate
+from .planner import plan
+from .serializers import ReportSerializer, PredictionSerializer
+
+STREAMS = {
+	'reports': (Report, ReportSerializer, 'send_report', 'report'),
+	'predictions': (Prediction, PredictionSerializer, 'send_prediction', 'prediction'),
+}
+
+# Create your feed helpers here.
+def recent(stream):
+	model = STREAMS[stream][0]
+	now = timezone.now()
+	return model.objects.filter(timestamp__gte=now - timedelta(hours=24), timestamp__lte=now).order_by('-timestamp', '-id')
+
+def message(event):
+	return { 'seq': event.id, 'action': event.action, STREAMS[event.stream][3]: event.payload }
+
+def page(stream, cursor=None, size=None, around=None, user=None):
+	serializer = STREAMS[stream][1]
+	queryset = recent(stream)
+	if around:
+		# Predictions are placed by the report they are about
+		queryset = geo.near(queryset, *around, prefix='' if stream == 'reports' else 'report__')
+	items, next_cursor = paginate(plan(queryset, serializer), cursor, size)
+	context = {}
+	if user is not None:
+		context['liked'] = likes.liked(stream, user, [item.id for item in items])
+	return serializer(items, many=True, context=context).data, next_cursor
+
+def first_page(stream):
+	# Only the first page with the default size is cached, the same for every viewer
+	data, next_cursor = page(stream)
+	return { 'data': [dict(item) for item in data], 'next': next_cursor }
+
+def version(stream):
+	# Seeded from the clock so a lost version key never points back at old content
+	return cache.get_or_set(f'feed:{stream}:version', time.time_ns, None)
+
+def invalidate(stream):
+	try:
+		cache.incr(f'feed:{stream}:version')
+	except ValueError:
+		version(stream)
+
+def cached(stream):
+	key = f'feed:{stream}:{version(stream)}'
+	content = cache.get(key)
+	if content is not None:
+		return content
+	# Only one client rebuilds a missing version, the others get the previous one meanwhile
+	if cache.add(f'{key}:lock', True, timeout=10):
+		try:
+			content = first_page(stream)
+			cache.set(key, content, timeout=settings.FEED_CACHE_TTL)
+			cache.set(f'feed:{stream}:stale', content, timeout=settings.FEED_CACHE_TTL * 10)
+		finally:
+			cache.delete(f'{key}:lock')
+		return content
+	for _ in range(20):
+		content = cache.get(key) or cache.get(f'feed:{stream}:stale')
+		if content is not None:
+			return content
+		time.sleep(0.05)
+	return first_page(stream)
+
+def merge(old, new):
+	# Both about the same item within one broadcast window, only the newer state is sent
+	if old['action'] == 'created' and new['action'] == 'updated':
+		return { **new, 'action': 'created' }
+	return new
+
+def push(stream, action, objects):
+	_, serializer, handler, key = STREAMS[stream]
+	objects = list(objects)
+	invalidate(stream)
+	if action == 'deleted':
+		payloads = [{ 'id': item.id } for item in objects]
+	else:
+		payloads = serializer(objects, many=True).data
+	events = FeedEvent.objects.bulk_create([
+		FeedEvent(stream=stream, action=action, object_id=item.id, payload=payload)
+		for item, payload in zip(objects, payloads)
+	])
+	broadcaster.send(stream, handler, [message(event) for event in events], key=lambda item: item[key]['id'], merge=merge)
+
+def latest(stream):
+	return FeedEvent.objects.filter(stream=stream).order_by('-id').values_list('id', flat=True).first() or 0
+
+def snapshot(stream):
+	# Read the sequence first, so anything written meanwhile is replayed rather than lost
+	seq = latest(stream)
+	data, next_cursor = page(stream)
+	return { 'seq': seq, stream: data, 'next': next_cursor }
+
+def replay(stream, since):
+	oldest = FeedEvent.objects.filter(stream=stream).order_by('id').values_list('id', flat=True).first()
+	events = list(FeedEvent.objects.filter(stream=stream, id__gt=since).order_by('id')[:settings.FEED_REPLAY_LIMIT + 1])
+	# Too far behind, or the events it missed were already pruned
+	if len(events) > settings.FEED_REPLAY_LIMIT or (oldest is not None and since < oldest - 1):
+		return snapshot(stream)
+	return { 'events': [message(event) for event in events] }
@@ -0,0 +1,106 @@
+import math
+from django.conf import settings
+from django.db.models import Q
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+EARTH_RADIUS = 6371.0088 # km
+
+# Create your geo helpers here.
+def encode(latitude, longitude, precision=9):
+	latitude_range = [-90.0, 90.0]
+	longitude_range = [-180.0, 180.0]
+	geohash = []
+	bits = 0
+	value = 0
+	even = True
+	while len(geohash) < precision:
+		interval, coordinate = (longitude_range, longitude) if even else (latitude_range, latitude)
+		middle = (interval[0] + interval[1]) / 2
+		value <<= 1
+		if coordinate >= middle:
+			value |= 1
+			interval[0] = middle
+		else:
+			interval[1] = middle
+		even = not even
+		bits += 1
+		if bits == 5:
+			geohash.append(BASE32[value])
+			bits = 0
+			value = 0
+	return ''.join(geohash)
+
+def cell_size(precision):
+	# Height and width of a cell in degrees
+	bits = precision * 5
+	return 180.0 / 2 ** (bits // 2), 360.0 / 2 ** (bits - bits // 2)
+
+def distance(latitude, longitude, other_latitude, other_longitude):
+	latitude, longitude, other_latitude, other_longitude = map(math.radians, (latitude, longitude, other_latitude, other_longitude))
+	a = math.sin((other_latitude - latitude) / 2) ** 2 + math.cos(latitude) * math.cos(other_latitude) * math.sin((other_longitude - longitude) / 2) ** 2
+	return 2 * EARTH_RADIUS * math.asin(math.sqrt(a))
+
+def box(latitude, longitude, radius):
+	# Bounds holding every point within radius km, the longitude span is widest at the latitude
+	# of the circle's tangent points, asin(sin(d) / cos(latitude)), not at the centre
+	angle = radius / EARTH_RADIUS
+	delta_latitude = math.degrees(angle)
+	south, north = latitude - delta_latitude, latitude + delta_latitude
+	if south <= -90.0 or north >= 90.0:
+		# The circle reaches a pole, every longitude is within range there
+		return max(-90.0, south), min(90.0, north), longitude - 180.0, longitude + 180.0
+	delta_longitude = math.degrees(math.asin(min(1.0, math.sin(angle) / math.cos(math.radians(latitude)))))
+	return south, north, longitude - delta_longitude, longitude + delta_longitude
+
+def cells(latitude, longitude, radius):
+	# The finest grid whose cells are at least as big as the box, so a handful of prefixes cover it
+	if not all(map(math.isfinite, (latitude, longitude, radius))):
+		raise ValueError('Invalid position')
+	south, north, west, east = box(latitude, longitude, radius)
+	precision = 1
+	while precision < 9:
+		height, width = cell_size(precision + 1)
+		if height < north - south or width < east - west:
+			break
+		precision += 1
+	height, width = cell_size(precision)
+	prefixes = set()
+	point_latitude = south
+	while True:
+		point_longitude = west
+		while True:
+			prefixes.add(encode(point_latitude, (point_longitude + 180.0) % 360.0 - 180.0, precision))
+			if point_longitude >= east:
+				break
+			point_longitude = min(east, point_longitude + width)
+		if point_latitude >= north:
+			break
+		point_latitude = min(north, point_latitude + height)
+	return prefixes
+
+def near(queryset, latitude, longitude, radius, prefix=''):
+	# Grid cells narrow the candidates through the geohash index, the exact distance decides
+	match = Q()
+	for cell in cells(latitude, longitude, radius):
+		match |= Q(**{ f'{prefix}geohash__startswith': cell })
+	candidates = queryset.filter(match).values_list('id', f'{prefix}latitude', f'{prefix}longitude')
+	ids = [id for id, other_latitude, other_longitude in candidates if distance(latitude, longitude, float(other_latitude), float(other_longitude)) <= radius]
+	return queryset.filter(id__in=ids)
+
+def around(params):
+	# (latitude, longitude, radius) from request parameters, None when no position is given
+	latitude = params.get('latitude')
+	longitude = params.get('longitude')
+	if latitude in (None, '') or longitude in (None, ''):
+		return None
+	try:
+		latitude, longitude, radius = float(latitude), float(longitude), float(params.get('radius') or settings.NEARBY_RADIUS)
+	except TypeError:
+		# Lists and objects from a JSON body
+		raise ValueError('Invalid position')
+	# nan fails every comparison, it has to be ruled out first or cells() never reaches the edge
+	if not all(map(math.isfinite, (latitude, longitude, radius))):
+		raise ValueError('Invalid position')
+	if not -90 <= latitude <= 90 or not -180 <= longitude <= 180 or radius <= 0:
+		raise ValueError('Invalid position')
+	return latitude, longitude, radius
@@ -0,0 +1,76 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from .workers import Worker
+
+# Create your inference helpers here.
+class Overloaded(Exception):
+	pass
+
+class MicroBatcher(Worker):
+	# Collects items from concurrent callers for up to max_wait seconds and hands them to handler as one batch
+	name = 'micro-batcher'
+
+	def __init__(self, handler, max_batch_size, max_wait, max_queue_size):
+		super().__init__()
+		self.handler = handler
+		self.max_batch_size = max_batch_size
+		self.max_wait = max_wait
+		self.max_queue_size = max_queue_size
+
+	def setup(self):
+		self.condition = threading.Condition()
+		self.requests = deque()
+		self.pending = 0
+
+	def process(self, items, timeout=None):
+		items = list(items)
+		if not items:
+			return []
+		future = Future()
+		self.start()
+		with self.condition:
+			# A request bigger than the whole queue is still accepted when nothing else is waiting
+			if self.pending and self.pending + len(items) > self.max_queue_size:
+				raise Overloaded(f'{self.pending} items already queued')
+			self.requests.append((items, future))
+			self.pending += len(items)
+			self.condition.notify()
+		return future.result(timeout)
+
+	def next_batch(self):
+		with self.condition:
+			while not self.requests:
+				self.condition.wait()
+			deadline = time.monotonic() + self.max_wait
+			batch = [self.requests.popleft()]
+			size = len(batch[0][0])
+			while size < self.max_batch_size:
+				if self.requests:
+					if size + len(self.requests[0][0]) > self.max_batch_size:
+						break
+					request = self.requests.popleft()
+					batch.append(request)
+					size += len(request[0])
+					continue
+				remaining = deadline - time.monotonic()
+				if remaining <= 0:
+					break
+				self.condition.wait(remaining)
+			self.pending -= size
+		return batch
+
+	def run(self):
+		while True:
+			batch = self.next_batch()
+			try:
+				results = self.handler([item for items, _ in batch for item in items])
+			except Exception as error:
+				for _, future in batch:
+					future.set_exception(error)
+				continue
+			start = 0
+			for items, future in batch:
+				future.set_result(results[start:start + len(items)])
+				start += len(items)
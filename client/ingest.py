@@ -0,0 +1,90 @@
+import logging
+import math
+from decimal import Decimal, InvalidOperation
+from django.conf import settings
+from django.db import transaction
+from . import feed, geo, series
+from .inference import Overloaded
+from .models import Report, LocationSentiment, NotificationOutbox
+from .sentiment import service
+
+REQUIRED = ('location', 'latitude', 'longitude', 'report-type', 'description', 'rating')
+COORDINATE = Decimal('0.000001')
+
+logger = logging.getLogger(__name__)
+
+# Create your ingestion helpers here.
+def validate(item, user):
+	# An unsaved Report and None, or None and the reason it was rejected
+	if not isinstance(item, dict) or any(not item.get(field) for field in REQUIRED):
+		return None, 'Fields are required'
+	# Readings come as free-form sensor-data, packed numeric sensor-series, or both
+	if not item.get('sensor-data') and not item.get('sensor-series'):
+		return None, 'Fields are required'
+	try:
+		latitude = Decimal(str(item['latitude'])).quantize(COORDINATE)
+		longitude = Decimal(str(item['longitude'])).quantize(COORDINATE)
+		rating = float(item['rating'])
+		sensor_series = series.pack(item['sensor-series']) if item.get('sensor-series') else None
+	except (InvalidOperation, TypeError, ValueError):
+		return None, 'Invalid parameters'
+	if not math.isfinite(rating):
+		return None, 'Invalid parameters'
+	if not latitude.is_finite() or not longitude.is_finite() or not -90 <= latitude <= 90 or not -180 <= longitude <= 180:
+		return None, 'Invalid position'
+	location, report_type, description = str(item['location']), str(item['report-type']), str(item['description'])
+	if len(location) > 225 or len(report_type) > 255:
+		return None, 'Invalid parameters'
+	return Report(
+		location=location,
+		latitude=latitude,
+		longitude=longitude,
+		# bulk_create skips Report.save, which sets it otherwise
+		geohash=geo.encode(float(latitude), float(longitude)),
+		report_type=report_type,
+		description=description,
+		sensor_data=item.get('sensor-data') or {},
+		sensor_series=sensor_series,
+		status='active',
+		rating=rating,
+		user=user
+	), None
+
+def label(reports):
+	try:
+		results = service.process([report.description for report in reports])
+	except Overloaded:
+		# Left unlabelled, explore classifies them on demand later
+		return
+	for report, result in zip(reports, results):
+		report.sentiment_label = result['label']
+		report.sentiment_score = result['score']
+
+def announce(reports):
+	# The reports are committed by now, failing the request would have the client send them again
+	try:
+		feed.push('reports', 'created', reports)
+	except Exception:
+		# Clients that missed the push see the reports on their next page load
+		logger.exception('Pushing %d new reports failed', len(reports))
+
+def create_reports(user, items):
+	# One result per item in order, {'id'} when stored or {'error'} when rejected
+	results = []
+	reports = []
+	for item in items:
+		report, error = validate(item, user)
+		results.append({ 'error': error } if report is None else None)
+		if report is not None:
+			reports.append(report)
+	if reports:
+		label(reports)
+		with transaction.atomic():
+			Report.objects.bulk_create(reports, batch_size=settings.INGEST_MAX_BATCH)
+			LocationSentiment.objects.record(reports)
+			# One notification for the whole batch instead of one per report
+			message = f'{user} reported {reports[0].description} at {reports[0].location}' if len(reports) == 1 else f'{user} submitted {len(reports)} reports'
+			NotificationOutbox.objects.create(actor=user, report=reports[0], action_type='Report', message=message, broadcast=True)
+		announce(reports)
+	stored = iter(reports)
+	return [result or { 'id': next(stored).id } for result in results]
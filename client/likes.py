@@ -0,0 +1,88 @@
+from django.db import connection, transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+from .models import Report, ReportLike, Prediction, PredictionLike, NotificationOutbox
+
+KINDS = {
+	'reports': (Report, ReportLike, 'report_id'),
+	'predictions': (Prediction, PredictionLike, 'prediction_id'),
+}
+MAX_ID = 2 ** 63 - 1 # BigAutoField, a larger number cannot be any row's id
+
+# Create your like helpers here.
+def is_id(value):
+	return value.isascii() and value.isdigit()
+
+def liked(kind, user, ids):
+	# The ids among these the user liked, one query for a whole page
+	_, model, field = KINDS[kind]
+	if not ids:
+		return set()
+	return set(model.objects.filter(user=user, **{ f'{field}__in': ids }).values_list(field, flat=True))
+
+def mark(kind, user, data):
+	# Serialized items shared by every viewer, copied with this viewer's flag
+	liked_ids = liked(kind, user, [item['id'] for item in data])
+	return [{ **item, 'liked_by_me': item['id'] in liked_ids } for item in data]
+
+def statuses(kind, user, ids):
+	# One query per kind answers existence and membership together, bad ids are reported one by one
+	target, model, field = KINDS[kind]
+	valid = [int(id) for id in ids if is_id(id) and int(id) <= MAX_ID]
+	liked_by_me = Exists(model.objects.filter(user=user, **{ field: OuterRef('pk') }))
+	found = dict(target.objects.filter(id__in=valid).annotate(liked_by_me=liked_by_me).values_list('id', 'liked_by_me')) if valid else {}
+	not_found = f'{target._meta.verbose_name.capitalize()} not found'
+	results = []
+	for id in ids:
+		if not is_id(id):
+			results.append({ 'id': id, 'error': 'Invalid id' })
+		elif int(id) not in found:
+			results.append({ 'id': int(id), 'error': not_found })
+		else:
+			results.append({ 'id': int(id), 'liked': found[int(id)] })
+	return results
+
+def like(kind, user, id):
+	# True when the like was added, False when it already existed or the item is the user's own, None when there is no such item
+	target, model, field = KINDS[kind]
+	if id > MAX_ID:
+		return None
+	name = field[:-len('_id')]
+	quote = connection.ops.quote_name
+	with transaction.atomic():
+		with connection.cursor() as cursor:
+			# The unique (item, user) constraint settles concurrent double taps, the loser simply inserts nothing
+			cursor.execute(
+				f'INSERT INTO {quote(model._meta.db_table)} (timestamp, {field}, user_id) '
+				f'SELECT %s, id, %s FROM {quote(target._meta.db_table)} WHERE id = %s AND (user_id IS NULL OR user_id <> %s) '
+				f'ON CONFLICT ({field}, user_id) DO NOTHING RETURNING id',
+				[connection.ops.adapt_datetimefield_value(timezone.now()), user.id, id, user.id]
+			)
+			row = cursor.fetchone()
+			if row is None:
+				return False if target.objects.filter(id=id).exists() else None
+			cursor.execute(f'UPDATE {quote(target._meta.db_table)} SET like_count = like_count + 1 WHERE id = %s RETURNING user_id', [id])
+			owner = cursor.fetchone()[0]
+		if owner is not None:
+			NotificationOutbox.objects.create(
+				actor=user,
+				action_type=model.__name__,
+				message=f'{user} liked your {target._meta.verbose_name}',
+				recipients=[owner],
+				**{ f'{name}_like_id': row[0] }
+			)
+	return True
+
+def unlike(kind, user, id):
+	# True when a like was removed, False when there was none
+	_, model, field = KINDS[kind]
+	if id > MAX_ID:
+		return False
+	with transaction.atomic():
+		# The row lock makes a concurrent unlike wait and then find nothing, so the like is uncounted once
+		ids = list(model.objects.select_for_update().filter(user=user, **{ field: id }).values_list('id', flat=True))
+		if not ids:
+			return False
+		# A queryset delete, so Django removes the notifications about the like and the post_delete receiver uncounts it
+		model.objects.filter(id__in=ids).delete()
+	return True
@@ -0,0 +1,33 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from client.archive import ROOTS, archive, prune_feed_events
+
+# Create your commands here.
+class Command(BaseCommand):
+	help = 'Move reports, predictions and notifications past the retention horizon into the archive, in chunks'
+
+	def add_arguments(self, parser):
+		parser.add_argument('--days', type=int, default=settings.ARCHIVE_AFTER_DAYS, help='Archive rows older than this')
+		parser.add_argument('--chunk-size', type=int, default=500, help='Root rows moved per transaction')
+		parser.add_argument('--max-chunks', type=int, default=0, help='Stop after this many chunks per kind, 0 for no limit')
+
+	def handle(self, *args, **options):
+		before = timezone.now() - timedelta(days=options['days'])
+		for model in ROOTS:
+			moved = chunks = 0
+			while not options['max_chunks'] or chunks < options['max_chunks']:
+				count = archive(model, before, options['chunk_size'])
+				moved += count
+				chunks += 1
+				if count < options['chunk_size']:
+					break
+			self.stdout.write(f'Archived {moved} {model._meta.verbose_name_plural}')
+		pruned = 0
+		while True:
+			count = prune_feed_events(options['chunk_size'])
+			pruned += count
+			if count < options['chunk_size']:
+				break
+		self.stdout.write(self.style.SUCCESS(f'Done, {pruned} feed events pruned'))
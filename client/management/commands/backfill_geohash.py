@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from client import geo
+from client.models import Report
+
+# Create your commands here.
+class Command(BaseCommand):
+	help = 'Fill in the geohash of reports created before it was stored'
+
+	def add_arguments(self, parser):
+		parser.add_argument('--batch-size', type=int, default=1000)
+
+	def handle(self, *args, **options):
+		total = 0
+		while True:
+			reports = list(Report.objects.filter(geohash__isnull=True).only('id', 'latitude', 'longitude').order_by('id')[:options['batch_size']])
+			if not reports:
+				break
+			for report in reports:
+				report.geohash = geo.encode(float(report.latitude), float(report.longitude))
+			Report.objects.bulk_update(reports, ['geohash'])
+			total += len(reports)
+			self.stdout.write(f'Updated {total} reports')
+		self.stdout.write(self.style.SUCCESS(f'Done, {total} reports updated'))
@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from client.models import Report
+from client.sentiment import label_reports
+
+# Create your commands here.
+class Command(BaseCommand):
+	help = 'Store sentiment labels for reports created before labels were persisted'
+
+	def add_arguments(self, parser):
+		parser.add_argument('--batch-size', type=int, default=settings.SENTIMENT_BATCH_SIZE * 8)
+
+	def handle(self, *args, **options):
+		total = 0
+		while True:
+			reports = list(Report.objects.filter(sentiment_label__isnull=True).only('id', 'description', 'location', 'timestamp', 'status').order_by('id')[:options['batch_size']])
+			if not reports:
+				break
+			# Reports labelled meanwhile by explore are skipped, not counted twice
+			total += len(label_reports(reports))
+			self.stdout.write(f'Labelled {total} reports')
+		self.stdout.write(self.style.SUCCESS(f'Done, {total} reports labelled'))
@@ -0,0 +1,37 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from rest_framework.authtoken.models import Token
+from client.authentication import tokens
+
+# Create your commands here.
+class Command(BaseCommand):
+	help = 'Measure requests per second on a read endpoint with and without the token cache'
+
+	def add_arguments(self, parser):
+		parser.add_argument('--path', default='/api/profile/')
+		parser.add_argument('--requests', type=int, default=500)
+
+	def run(self, client, url, count):
+		client.get(url)
+		start = time.perf_counter()
+		for _ in range(count):
+			client.get(url)
+		return count / (time.perf_counter() - start)
+
+	def handle(self, *args, **options):
+		token = Token.objects.first()
+		if token is None:
+			raise CommandError('Register a user first, the benchmark needs a token')
+		client = Client()
+		url = f"{options['path']}?token={token.key}"
+		size = tokens.size
+
+		tokens.size = 0
+		tokens.clear()
+		uncached = self.run(client, url, options['requests'])
+
+		tokens.size = size
+		cached = self.run(client, url, options['requests'])
+
+		self.stdout.write(f'{options["path"]}: {uncached:.0f} req/s uncached, {cached:.0f} req/s cached ({cached / uncached:.2f}x)')
@@ -0,0 +1,103 @@
+import random
+import statistics
+import time
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, models, transaction
+from client import feed, geo
+from client.models import Notification, Report
+from client.pagination import paginate
+
+# Single column indexes the redesign dropped, and the composite/partial ones it added
+DROPPED = {
+	Report: ['location', 'latitude', 'longitude', 'report_type', 'description', 'timestamp', 'status', 'sensor_data',
+				'verification_status', 'rating', 'sentiment_label'],
+	Notification: ['action_type', 'message', 'broadcast'],
+}
+ADDED = {
+	Report: ['report_feed'],
+}
+
+class Rollback(Exception):
+	pass
+
+# Create your commands here.
+class Command(BaseCommand):
+	help = 'Compare insert throughput and feed latency with the old per-column indexes and the current ones (nothing is kept)'
+
+	def add_arguments(self, parser):
+		parser.add_argument('--rows', type=int, default=2000, help='Reports and notifications inserted per run')
+		parser.add_argument('--queries', type=int, default=50, help='Feed queries timed per run')
+
+	def legacy_sql(self):
+		# Collected outside any transaction, SQLite refuses to open a schema editor inside one
+		with connection.schema_editor(collect_sql=True) as editor:
+			for model, fields in DROPPED.items():
+				for field in fields:
+					editor.add_index(model, models.Index(fields=[field], name=f'legacy_{model._meta.model_name}_{field}'[:30]))
+			for model, names in ADDED.items():
+				for index in model._meta.indexes:
+					if index.name in names:
+						editor.remove_index(model, index)
+		return editor.collected_sql
+
+	def run(self, rows, queries):
+		user = User.objects.create_user(username=f'benchmark-{random.getrandbits(32)}')
+		start = time.perf_counter()
+		for index in range(rows):
+			latitude, longitude = random.uniform(-60, 60), random.uniform(-180, 180)
+			# One statement per report, like submit-report
+			Report.objects.bulk_create([Report(
+				location=f'Location {index % 50}',
+				latitude=round(latitude, 6),
+				longitude=round(longitude, 6),
+				geohash=geo.encode(latitude, longitude),
+				report_type=random.choice(['traffic', 'noise', 'crowd']),
+				description=f'Benchmark report {index}',
+				status='active',
+				sensor_data={ 'value': index },
+				rating=random.uniform(1, 5),
+				user=user
+			)])
+		reports_per_second = rows / (time.perf_counter() - start)
+
+		start = time.perf_counter()
+		for offset in range(0, rows, 100):
+			# Batches of 100, like dispatch_notifications
+			Notification.objects.bulk_create([
+				Notification(actor=user, action_type='Report', message=f'Benchmark notification {index}', broadcast=index % 2 == 0)
+				for index in range(offset, min(rows, offset + 100))
+			])
+		notifications_per_second = rows / (time.perf_counter() - start)
+
+		feed_times = []
+		notification_times = []
+		for _ in range(queries):
+			start = time.perf_counter()
+			feed.page('reports')
+			feed_times.append(time.perf_counter() - start)
+			start = time.perf_counter()
+			paginate(Notification.objects.for_user(user))
+			notification_times.append(time.perf_counter() - start)
+		return reports_per_second, notifications_per_second, statistics.median(feed_times) * 1000, statistics.median(notification_times) * 1000
+
+	def measure(self, sql, rows, queries):
+		# Everything, schema changes included, is rolled back afterwards
+		try:
+			with transaction.atomic():
+				with connection.cursor() as cursor:
+					for statement in sql:
+						cursor.execute(statement.rstrip(';'))
+				result = self.run(rows, queries)
+				raise Rollback
+		except Rollback:
+			return result
+
+	def handle(self, *args, **options):
+		rows, queries = options['rows'], options['queries']
+		results = {
+			'per-column indexes': self.measure(self.legacy_sql(), rows, queries),
+			'current indexes': self.measure([], rows, queries),
+		}
+		for name, (reports, notifications, feed_ms, notifications_ms) in results.items():
+			self.stdout.write(f'{name}: {reports:.0f} reports/s, {notifications:.0f} notifications/s, feed page {feed_ms:.2f} ms, notifications page {notifications_ms:.2f} ms')
@@ -0,0 +1,72 @@
+import statistics
+import time
+from django.core.management.base import BaseCommand
+from client.models import Report
+from client.sentiment import load_model, classify, verdict
+from .benchmark_sentiment import SAMPLES
+
+def current_rss():
+	with open('/proc/self/status') as status:
+		for line in status:
+			if line.startswith('VmRSS:'):
+				return int(line.split()[1]) / 1024
+	return 0
+
+# Create your commands here.
+class Command(BaseCommand):
+	help = 'Compare the fp32 and int8-quantized sentiment models on held-out report descriptions'
+
+	def add_arguments(self, parser):
+		parser.add_argument('--limit', type=int, default=500, help='Number of latest report descriptions to use')
+		parser.add_argument('--file', help='Read descriptions from this file instead, one per line')
+		parser.add_argument('--latency-samples', type=int, default=50)
+
+	def descriptions(self, options):
+		if options['file']:
+			with open(options['file']) as file:
+				return [line.strip() for line in file if line.strip()]
+		descriptions = list(Report.objects.exclude(description__isnull=True).order_by('-id').values_list('description', flat=True)[:options['limit']])
+		return descriptions or SAMPLES
+
+	def measure(self, quantize, descriptions, latency_samples):
+		rss = current_rss()
+		start = time.perf_counter()
+		model = load_model(quantize=quantize)
+		load_time = time.perf_counter() - start
+		memory = current_rss() - rss
+		classify(['warm up'], model=model)
+
+		latencies = []
+		for description in descriptions[:latency_samples]:
+			start = time.perf_counter()
+			classify([description], model=model)
+			latencies.append((time.perf_counter() - start) * 1000)
+
+		start = time.perf_counter()
+		labels = [result['label'] for result in classify(descriptions, model=model)]
+		throughput = len(descriptions) / (time.perf_counter() - start)
+		return {
+			'load': load_time,
+			'memory': memory,
+			'p50': statistics.median(latencies),
+			'p95': sorted(latencies)[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+			'throughput': throughput,
+			'labels': labels,
+		}
+
+	def handle(self, *args, **options):
+		descriptions = self.descriptions(options)
+		# The smaller model is loaded first so its RSS growth is not hidden by the larger one
+		quantized = self.measure(True, descriptions, options['latency_samples'])
+		full = self.measure(False, descriptions, options['latency_samples'])
+
+		self.stdout.write(f'{len(descriptions)} descriptions')
+		self.stdout.write(f'{"mode":<6} {"load":>8} {"rss +":>9} {"p50":>9} {"p95":>9} {"throughput":>12}')
+		for label, result in (('fp32', full), ('int8', quantized)):
+			self.stdout.write(
+				f'{label:<6} {result["load"]:>7.2f}s {result["memory"]:>7.0f}MB {result["p50"]:>7.1f}ms '
+				f'{result["p95"]:>7.1f}ms {result["throughput"]:>8.1f}/s'
+			)
+		agreement = sum(a == b for a, b in zip(full['labels'], quantized['labels'])) / len(descriptions)
+		same = verdict(full['labels']) == verdict(quantized['labels'])
+		self.stdout.write(f'Label agreement: {agreement:.2%}, majority verdict {"matches" if same else "DIFFERS"}')
@@ -0,0 +1,41 @@
+import random
+import time
+from django.core.management.base import BaseCommand
+from client.sentiment import get_model, classify, verdict
+
+SAMPLES = [
+	'Heavy traffic jam on the main road, nothing is moving',
+	'Streets are calm and clear this morning',
+	'Loud construction noise all night, impossible to sleep',
+	'Nice crowd at the market, everyone is friendly',
+	'Flooding near the bridge, cars are stuck',
+	'Bus arrived on time and the ride was smooth',
+	'Power outage across the whole block since noon',
+	'Festival in the park, great music and food',
+]
+
+# Create your commands here.
+class Command(BaseCommand):
+	help = 'Compare per-report and batched sentiment inference'
+
+	def add_arguments(self, parser):
+		parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000])
+		parser.add_argument('--batch-size', type=int, default=None)
+
+	def handle(self, *args, **options):
+		random.seed(0)
+		model = get_model()
+		self.stdout.write(f'{"reports":>8} {"per-report":>12} {"batched":>12} {"speedup":>8}  verdict')
+		for size in options['sizes']:
+			descriptions = [' '.join(random.choices(SAMPLES, k=random.randint(1, 4))) for _ in range(size)]
+
+			start = time.perf_counter()
+			single = [model(description)[0]['label'] for description in descriptions]
+			single_time = time.perf_counter() - start
+
+			start = time.perf_counter()
+			batched = [result['label'] for result in classify(descriptions, batch_size=options['batch_size'])]
+			batched_time = time.perf_counter() - start
+
+			status = 'same' if verdict(single) == verdict(batched) else 'DIFFERENT'
+			self.stdout.write(f'{size:>8} {single_time:>11.3f}s {batched_time:>11.3f}s {single_time / batched_time:>7.1f}x  {status}')
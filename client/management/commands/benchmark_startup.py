@@ -0,0 +1,43 @@
+import json
+import os
+import subprocess
+import sys
+from django.core.management.base import BaseCommand
+
+# Runs in a fresh interpreter so import and load costs are not already paid
+PROBE = '''
+import json, resource, time
+start = time.perf_counter()
+import django
+django.setup()
+import client.views
+boot = time.perf_counter() - start
+if {load}:
+	from client import sentiment
+	sentiment.get_model()
+total = time.perf_counter() - start
+print(json.dumps({{ 'boot': boot, 'total': total, 'rss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss }}))
+'''
+
+# Create your commands here.
+class Command(BaseCommand):
+	help = 'Measure process start-up time and peak RSS with and without loading the sentiment model'
+
+	def add_arguments(self, parser):
+		parser.add_argument('--runs', type=int, default=3)
+
+	def probe(self, load):
+		output = subprocess.run(
+			[sys.executable, '-c', PROBE.format(load=load)],
+			capture_output=True, text=True, check=True, env=os.environ.copy()
+		)
+		return json.loads(output.stdout.strip().splitlines()[-1])
+
+	def handle(self, *args, **options):
+		self.stdout.write(f'{"mode":<24} {"boot":>9} {"total":>9} {"peak rss":>10}')
+		for label, load in (('lazy (model unused)', False), ('eager (model loaded)', True)):
+			samples = [self.probe(load) for _ in range(options['runs'])]
+			boot = min(sample['boot'] for sample in samples)
+			total = min(sample['total'] for sample in samples)
+			rss = max(sample['rss'] for sample in samples) / 1024
+			self.stdout.write(f'{label:<24} {boot:>8.2f}s {total:>8.2f}s {rss:>8.0f}MB')
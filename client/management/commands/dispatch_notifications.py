@@ -0,0 +1,27 @@
+import time
+from django.core.management.base import BaseCommand
+from client.broadcast import broadcaster
+from client.dispatcher import dispatch
+
+# Create your commands here.
+class Command(BaseCommand):
+	help = 'Turn queued outbox entries into notifications and push them to the websocket groups'
+
+	def add_arguments(self, parser):
+		parser.add_argument('--batch-size', type=int, default=500)
+		parser.add_argument('--interval', type=float, default=0.5, help='Seconds to sleep when the outbox is empty')
+		parser.add_argument('--once', action='store_true', help='Drain the outbox and exit')
+
+	def handle(self, *args, **options):
+		try:
+			while True:
+				dispatched = dispatch(options['batch_size'])
+				if dispatched:
+					self.stdout.write(f'Dispatched {dispatched} notifications')
+				if dispatched < options['batch_size']:
+					if options['once']:
+						break
+					time.sleep(options['interval'])
+		finally:
+			# Pushes still held in the broadcast window would die with the process
+			broadcaster.flush()
@@ -0,0 +1,32 @@
+import time
+from django.core.management.base import BaseCommand
+from client.broadcast import broadcaster
+from client.expiry import expire
+
+# Create your commands here.
+class Command(BaseCommand):
+	help = 'Mark active reports expired once their type\'s TTL has passed, pushing feed updates for them'
+
+	def add_arguments(self, parser):
+		parser.add_argument('--batch-size', type=int, default=500)
+		parser.add_argument('--max-batches', type=int, default=20, help='Batches per sweep, the rest waits for the next one')
+		parser.add_argument('--interval', type=float, default=60, help='Seconds between sweeps')
+		parser.add_argument('--once', action='store_true', help='Run one sweep and exit')
+
+	def handle(self, *args, **options):
+		try:
+			while True:
+				expired = 0
+				for _ in range(options['max_batches']):
+					count = expire(options['batch_size'])
+					expired += count
+					if count < options['batch_size']:
+						break
+				if expired:
+					self.stdout.write(f'Expired {expired} reports')
+				if options['once']:
+					break
+				time.sleep(options['interval'])
+		finally:
+			# Pushes still held in the broadcast window would die with the process
+			broadcaster.flush()
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from client import search
+
+# Create your commands here.
+class Command(BaseCommand):
+	help = 'Create the full-text search index for reports (also run after migrate)'
+
+	def add_arguments(self, parser):
+		parser.add_argument('--database', default='default')
+
+	def handle(self, *args, **options):
+		search.install(options['database'])
+		self.stdout.write(self.style.SUCCESS('Search index installed'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from client.models import Report, ReportLike, Prediction, PredictionLike
+
+# Create your commands here.
+class Command(BaseCommand):
+	help = 'Recount like_count on reports and predictions from their like rows'
+
+	def handle(self, *args, **options):
+		for model, like_model, field in ((Report, ReportLike, 'report'), (Prediction, PredictionLike, 'prediction')):
+			counts = like_model.objects.filter(**{ field: OuterRef('pk') }).order_by().values(field).annotate(count=Count('id')).values('count')
+			updated = model.objects.update(like_count=Coalesce(Subquery(counts), Value(0)))
+			self.stdout.write(self.style.SUCCESS(f'Recounted likes of {updated} {model._meta.verbose_name_plural}'))
@@ -0,0 +1,35 @@
+from collections import defaultdict
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from client.models import Report, LocationSentiment
+
+# Create your commands here.
+class Command(BaseCommand):
+	help = 'Rebuild the per-location hourly sentiment counters from reports'
+
+	def add_arguments(self, parser):
+		parser.add_argument('--hours', type=int, default=24, help='Rebuild the buckets of this many past hours')
+		parser.add_argument('--keep-hours', type=int, default=48, help='Delete buckets older than this')
+
+	def handle(self, *args, **options):
+		manager = LocationSentiment.objects
+		since = manager.bucket(timezone.now()) - timedelta(hours=options['hours'] - 1)
+		reports = Report.objects.filter(
+			timestamp__gte=since,
+			status='active',
+			sentiment_label__in=['POSITIVE', 'NEGATIVE']
+		).only('location', 'timestamp', 'status', 'sentiment_label')
+		counts = defaultdict(lambda: [0, 0])
+		for report in reports.iterator(chunk_size=2000):
+			location, bucket, label = manager.key(report)
+			counts[(location, bucket)][0 if label == 'POSITIVE' else 1] += 1
+		with transaction.atomic():
+			manager.filter(bucket__gte=since).delete()
+			manager.bulk_create(
+				[LocationSentiment(location=location, bucket=bucket, positive=positive, negative=negative) for (location, bucket), (positive, negative) in counts.items()],
+				batch_size=1000
+			)
+		deleted, _ = manager.filter(bucket__lt=manager.bucket(timezone.now()) - timedelta(hours=options['keep_hours'])).delete()
+		self.stdout.write(self.style.SUCCESS(f'Rebuilt {len(counts)} buckets, deleted {deleted} old buckets'))
@@ -16,6 +16,7 @@ class NotificationModelSerializer(serializers.ModelSerializer):
 					'action_type',
 					'message',
 					'timestamp',
+					'broadcast',
 					'user',
 				]
 		read_only_fields = fields
@@ -21,6 +21,7 @@ class ProfileModelSerializer(serializers.ModelSerializer):
 					'last_modified',
 					'verification_status',
 					'notification_status',
+					'notifications_read_at',
 					'user',
 				]
 		read_only_fields = fields
@@ -1,8 +1,20 @@
-from django.db import models
+from collections import defaultdict
+from datetime import timedelta
+from django.db import models, transaction
+from django.db.models import F, Q, Sum
 from django.contrib.auth.models import User
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
 from cloudinary.models import CloudinaryField
+from . import geo
 
 # Create your models here.
+class NotificationManager(models.Manager):
+	def for_user(self, user):
+		# Targeted rows from the user table, merged with the broadcasts sent since the user joined
+		targeted = Notification.user.through.objects.filter(user=user).values('notification_id')
+		return self.filter(Q(id__in=targeted) | Q(broadcast=True, timestamp__gte=user.date_joined))
+
 class Notification(models.Model):
 	actor = models.ForeignKey(User, on_delete=models.CASCADE, db_index=True)
 	report = models.ForeignKey('Report', on_delete=models.CASCADE, blank=True, null=True, db_index=True)
@@ -10,42 +22,130 @@ class Notification(models.Model):
 	prediction = models.ForeignKey('Prediction', on_delete=models.CASCADE, blank=True, null=True, db_index=True)
 	prediction_like = models.ForeignKey('PredictionLike', on_delete=models.CASCADE, blank=True, null=True, db_index=True)
 	feedback = models.ForeignKey('Feedback', on_delete=models.CASCADE, blank=True, null=True, db_index=True)
-	action_type = models.CharField(max_length=16, db_index=True) # Report, ReportLike, Prediction, PredictionLike, Feedback
-	message = models.CharField(max_length=225, db_index=True)
-	timestamp = models.DateTimeField(auto_now_add=True, db_index=True)
+	action_type = models.CharField(max_length=16) # Report, ReportLike, Prediction, PredictionLike, Feedback
+	message = models.CharField(max_length=225)
+	timestamp = models.DateTimeField(default=timezone.now, db_index=True) # Pages are read newest first along this index
+	broadcast = models.BooleanField(default=False) # Sent to every user, who get no row in the user table
 	user = models.ManyToManyField(User, related_name='notifications', db_index=True)
 
+	objects = NotificationManager()
+
+class NotificationOutbox(models.Model):
+	# Written in the same transaction as the event, turned into a Notification by dispatch_notifications
+	actor = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+	report = models.ForeignKey('Report', on_delete=models.CASCADE, blank=True, null=True, related_name='+')
+	report_like = models.ForeignKey('ReportLike', on_delete=models.CASCADE, blank=True, null=True, related_name='+')
+	prediction = models.ForeignKey('Prediction', on_delete=models.CASCADE, blank=True, null=True, related_name='+')
+	prediction_like = models.ForeignKey('PredictionLike', on_delete=models.CASCADE, blank=True, null=True, related_name='+')
+	feedback = models.ForeignKey('Feedback', on_delete=models.CASCADE, blank=True, null=True, related_name='+')
+	action_type = models.CharField(max_length=16)
+	message = models.CharField(max_length=225)
+	broadcast = models.BooleanField(default=False)
+	recipients = models.JSONField(default=list, blank=True) # User ids, unused for broadcasts
+	timestamp = models.DateTimeField(auto_now_add=True)
+
 class Profile(models.Model):
-	phone_number = models.CharField(max_length=255, blank=True, null=True, db_index=True)
+	phone_number = models.CharField(max_length=255, blank=True, null=True)
 	profile_picture = CloudinaryField('image', folder='profile-pictures', blank=True, null=True)
-	location = models.CharField(max_length=255, blank=True, null=True, db_index=True)
-	timestamp = models.DateTimeField(auto_now_add=True, db_index=True)
-	last_modified = models.DateTimeField(auto_now_add=True, db_index=True)
-	verification_status = models.BooleanField(default=False, db_index=True)
-	notification_status = models.BooleanField(default=False, db_index=True)
+	location = models.CharField(max_length=255, blank=True, null=True)
+	timestamp = models.DateTimeField(auto_now_add=True)
+	last_modified = models.DateTimeField(auto_now_add=True)
+	verification_status = models.BooleanField(default=False)
+	notification_status = models.BooleanField(default=False)
+	notifications_read_at = models.DateTimeField(blank=True, null=True)
 	user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile', db_index=True)
 
 class Report(models.Model):
-	location = models.CharField(max_length=225, blank=True, null=True, db_index=True)
-	latitude = models.DecimalField(max_digits=9, decimal_places=6, db_index=True)
-	longitude = models.DecimalField(max_digits=9, decimal_places=6, db_index=True)
-	report_type = models.CharField(max_length=255, db_index=True) # e.g., traffic, noise, crowd
-	description = models.TextField(blank=True, null=True, db_index=True)
-	timestamp = models.DateTimeField(auto_now_add=True, db_index=True)
-	status = models.CharField(max_length=255, db_index=True) # e.g., active, expired
-	sensor_data = models.JSONField(default=dict, blank=True, null=True, db_index=True)
-	verification_status = models.BooleanField(default=False, db_index=True)
-	rating = models.FloatField(blank=True, null=True, db_index=True)
+	location = models.CharField(max_length=225, blank=True, null=True)
+	latitude = models.DecimalField(max_digits=9, decimal_places=6)
+	longitude = models.DecimalField(max_digits=9, decimal_places=6)
+	geohash = models.CharField(max_length=12, blank=True, null=True, db_index=True) # Grid cell of latitude/longitude, set on save
+	report_type = models.CharField(max_length=255) # e.g., traffic, noise, crowd
+	description = models.TextField(blank=True, null=True) # Searched through the text index, see search.py
+	timestamp = models.DateTimeField(auto_now_add=True)
+	status = models.CharField(max_length=255) # e.g., active, expired
+	sensor_data = models.JSONField(default=dict, blank=True, null=True)
+	sensor_series = models.BinaryField(blank=True, null=True) # Packed numeric readings, see series.py
+	verification_status = models.BooleanField(default=False)
+	rating = models.FloatField(blank=True, null=True)
+	sentiment_label = models.CharField(max_length=16, blank=True, null=True) # POSITIVE, NEGATIVE
+	sentiment_score = models.FloatField(blank=True, null=True)
+	like_count = models.PositiveIntegerField(default=0) # Kept in step with ReportLike rows
 	user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='reports', db_index=True)
 
+	class Meta:
+		indexes = [
+			# The feeds and their cursor pages: a timestamp range ordered by (timestamp, id)
+			models.Index(fields=['timestamp', 'id'], name='report_feed'),
+			# Explore and the expiry sweeper only look at active reports, which stay a small share of the table
+			models.Index(fields=['timestamp'], condition=Q(status='active'), name='report_active_timestamp'),
+		]
+
 	def save(self, *args, **kwargs):
-		super().save(*args, **kwargs)
-		notification = Notification.objects.create(actor=self.user, report=self, action_type='Report', message=f'{self.user} reported {self.description} at {self.location}')
-		notification.user.set(User.objects.all())
+		previous = None
+		if not self._state.adding:
+			previous = Report.objects.filter(pk=self.pk).only('location', 'timestamp', 'status', 'sentiment_label').first()
+		self.geohash = geo.encode(float(self.latitude), float(self.longitude))
+		with transaction.atomic():
+			super().save(*args, **kwargs)
+			if previous is None or LocationSentiment.objects.key(previous) != LocationSentiment.objects.key(self):
+				if previous is not None:
+					LocationSentiment.objects.record([previous], -1)
+				LocationSentiment.objects.record([self])
+			if previous is None:
+				NotificationOutbox.objects.create(actor=self.user, report=self, action_type='Report', message=f'{self.user} reported {self.description} at {self.location}', broadcast=True)
+
+class LocationSentimentManager(models.Manager):
+	def normalize(self, location):
+		return ' '.join((location or '').lower().split())
+
+	def bucket(self, timestamp):
+		return timestamp.replace(minute=0, second=0, microsecond=0)
+
+	def key(self, report):
+		# Only active, labelled reports are counted
+		if report.status != 'active' or report.sentiment_label not in ('POSITIVE', 'NEGATIVE'):
+			return None
+		return (self.normalize(report.location), self.bucket(report.timestamp), report.sentiment_label)
+
+	def record(self, reports, delta=1):
+		counts = defaultdict(lambda: [0, 0])
+		for report in reports:
+			key = self.key(report)
+			if key is None:
+				continue
+			location, bucket, label = key
+			counts[(location, bucket)][0 if label == 'POSITIVE' else 1] += delta
+		with transaction.atomic():
+			for (location, bucket), (positive, negative) in counts.items():
+				self.get_or_create(location=location, bucket=bucket)
+				self.filter(location=location, bucket=bucket).update(
+					positive=F('positive') + positive,
+					negative=F('negative') + negative
+				)
+
+	def totals(self, location, hours=24):
+		since = self.bucket(timezone.now()) - timedelta(hours=hours - 1)
+		totals = self.filter(location=self.normalize(location), bucket__gte=since).aggregate(
+			positive=Sum('positive'),
+			negative=Sum('negative')
+		)
+		return totals['positive'] or 0, totals['negative'] or 0
+
+class LocationSentiment(models.Model):
+	location = models.CharField(max_length=225) # Lowercased, whitespace collapsed, leads the unique index
+	bucket = models.DateTimeField(db_index=True) # Start of the hour
+	positive = models.IntegerField(default=0)
+	negative = models.IntegerField(default=0)
+
+	objects = LocationSentimentManager()
+
+	class Meta:
+		unique_together = ('location', 'bucket')
 
 class ReportLike(models.Model):
-	timestamp = models.DateTimeField(auto_now_add=True, db_index=True)
-	report = models.ForeignKey(Report, on_delete=models.CASCADE, related_name='likes', db_index=True)
+	timestamp = models.DateTimeField(auto_now_add=True)
+	report = models.ForeignKey(Report, on_delete=models.CASCADE, related_name='likes', db_index=False) # Leads the unique index
 	user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='liked_reports', db_index=True)
 
 	class Meta:
@@ -55,28 +155,40 @@ class ReportLike(models.Model):
 		if self.report.user == self.user:
 			return
 		else:
-			super().save(*args, **kwargs)
-			notification = Notification.objects.create(actor=self.user, report_like=self, action_type='ReportLike', message=f'{self.user} liked your report')
-			notification.user.set([self.report.user])
+			created = self._state.adding
+			with transaction.atomic():
+				super().save(*args, **kwargs)
+				if created:
+					Report.objects.filter(pk=self.report_id).update(like_count=F('like_count') + 1)
+					self.report.refresh_from_db(fields=['like_count'])
+				NotificationOutbox.objects.create(actor=self.user, report_like=self, action_type='ReportLike', message=f'{self.user} liked your report', recipients=[self.report.user_id])
 
 class Prediction(models.Model):
-	predicted_event = models.CharField(max_length=255, db_index=True)
-	generated_text = models.TextField(db_index=True)
-	confidence_score = models.FloatField(db_index=True) # 0-1 indicating AI confidence
-	valid_until = models.DateTimeField(auto_now_add=True, blank=True, null=True, db_index=True)
-	ai_model_version = models.CharField(max_length=255, default='GPT-4', db_index=True)
-	timestamp = models.DateTimeField(auto_now_add=True, db_index=True)
+	predicted_event = models.CharField(max_length=255)
+	generated_text = models.TextField()
+	confidence_score = models.FloatField() # 0-1 indicating AI confidence
+	valid_until = models.DateTimeField(auto_now_add=True, blank=True, null=True)
+	ai_model_version = models.CharField(max_length=255, default='GPT-4')
+	like_count = models.PositiveIntegerField(default=0) # Kept in step with PredictionLike rows
+	timestamp = models.DateTimeField(auto_now_add=True)
 	user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='predictions', blank=True, null=True, db_index=True)
 	report = models.ForeignKey(Report, on_delete=models.CASCADE, related_name='predictions', db_index=True)
 
+	class Meta:
+		indexes = [
+			models.Index(fields=['timestamp', 'id'], name='prediction_feed'),
+		]
+
 	def save(self, *args, **kwargs):
-		super().save(*args, **kwargs)
-		notification = Notification.objects.create(actor=self.user, prediction=self, action_type='Prediction', message=f'{self.user} added prediction on {self.report.description}')
-		notification.user.set(User.objects.all())
+		created = self._state.adding
+		with transaction.atomic():
+			super().save(*args, **kwargs)
+			if created:
+				NotificationOutbox.objects.create(actor=self.user, prediction=self, action_type='Prediction', message=f'{self.user} added prediction on {self.report.description}', broadcast=True)
 
 class PredictionLike(models.Model):
-	timestamp = models.DateTimeField(auto_now_add=True, db_index=True)
-	prediction = models.ForeignKey(Prediction, on_delete=models.CASCADE, related_name='likes', db_index=True)
+	timestamp = models.DateTimeField(auto_now_add=True)
+	prediction = models.ForeignKey(Prediction, on_delete=models.CASCADE, related_name='likes', db_index=False) # Leads the unique index
 	user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='liked_predictions', db_index=True)
 
 	class Meta:
@@ -86,30 +198,67 @@ class PredictionLike(models.Model):
 		if self.prediction.user == self.user:
 			return
 		else:
-			super().save(*args, **kwargs)
-			notification = Notification.objects.create(actor=self.user, prediction_like=self, action_type='PredictionLike', message=f'{self.user} liked your prediction')
-			notification.user.set([self.prediction.user])
+			created = self._state.adding
+			with transaction.atomic():
+				super().save(*args, **kwargs)
+				if created:
+					Prediction.objects.filter(pk=self.prediction_id).update(like_count=F('like_count') + 1)
+					self.prediction.refresh_from_db(fields=['like_count'])
+				NotificationOutbox.objects.create(actor=self.user, prediction_like=self, action_type='PredictionLike', message=f'{self.user} liked your prediction', recipients=[self.prediction.user_id])
 
 class Feedback(models.Model):
-	rating = models.IntegerField(null=True, blank=True, db_index=True)
-	comment = models.TextField(null=True, blank=True, db_index=True)
-	is_accurate = models.BooleanField(default=False, null=True, blank=True, db_index=True)
-	timestamp = models.DateTimeField(auto_now_add=True, db_index=True)
-	parent_feedback = models.ForeignKey('self', on_delete=models.CASCADE, related_name='replies', blank=True, null=True, db_index=True)
+	rating = models.IntegerField(null=True, blank=True)
+	comment = models.TextField(null=True, blank=True)
+	is_accurate = models.BooleanField(default=False, null=True, blank=True)
+	timestamp = models.DateTimeField(auto_now_add=True)
+	# Indexed below together with the timestamp they are listed by
+	parent_feedback = models.ForeignKey('self', on_delete=models.CASCADE, related_name='replies', blank=True, null=True, db_index=False)
 	user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='feedbacks', blank=True, null=True, db_index=True)
-	prediction = models.ForeignKey(Prediction, on_delete=models.CASCADE, related_name='feedbacks', blank=True, null=True, db_index=True)
-	report = models.ForeignKey(Report, on_delete=models.CASCADE, related_name='feedbacks', blank=True, null=True, db_index=True)
+	prediction = models.ForeignKey(Prediction, on_delete=models.CASCADE, related_name='feedbacks', blank=True, null=True, db_index=False)
+	report = models.ForeignKey(Report, on_delete=models.CASCADE, related_name='feedbacks', blank=True, null=True, db_index=False)
+
+	class Meta:
+		indexes = [
+			models.Index(fields=['report', 'timestamp', 'id'], name='feedback_report'),
+			models.Index(fields=['prediction', 'timestamp', 'id'], name='feedback_prediction'),
+			models.Index(fields=['parent_feedback', 'timestamp', 'id'], name='feedback_replies'),
+		]
 
 	def save(self, *args, **kwargs):
 		if self.prediction:
-			super().save(*args, **kwargs)
-			notification = Notification.objects.create(actor=self.user, feedback=self, action_type='Feedback', message=f'{self.user} added feedback on your prediction')
-			notification.user.set([self.prediction.user])
+			with transaction.atomic():
+				super().save(*args, **kwargs)
+				NotificationOutbox.objects.create(actor=self.user, feedback=self, action_type='Feedback', message=f'{self.user} added feedback on your prediction', recipients=[self.prediction.user_id])
 		elif self.report:
-			super().save(*args, **kwargs)
-			notification = Notification.objects.create(actor=self.user, feedback=self, action_type='Feedback', message=f'{self.user} added feedback on your report')
-			notification.user.set([self.report.user])
+			with transaction.atomic():
+				super().save(*args, **kwargs)
+				NotificationOutbox.objects.create(actor=self.user, feedback=self, action_type='Feedback', message=f'{self.user} added feedback on your report', recipients=[self.report.user_id])
 		elif self.parent_feedback:
-			super().save(*args, **kwargs)
-			notification = Notification.objects.create(actor=self.user, feedback=self, action_type='Feedback', message=f'{self.user} replied to your feedback')
-			notification.user.set([self.parent_feedback.user])
+			with transaction.atomic():
+				super().save(*args, **kwargs)
+				NotificationOutbox.objects.create(actor=self.user, feedback=self, action_type='Feedback', message=f'{self.user} replied to your feedback', recipients=[self.parent_feedback.user_id])
+
+class FeedEvent(models.Model):
+	# The id is the sequence number clients resume from
+	stream = models.CharField(max_length=16) # reports, predictions
+	action = models.CharField(max_length=16) # created, updated, deleted
+	object_id = models.BigIntegerField()
+	payload = models.JSONField(default=dict, blank=True)
+	timestamp = models.DateTimeField(auto_now_add=True, db_index=True) # prune_feed_events deletes by age along this index
+
+	class Meta:
+		indexes = [
+			# Replay and the latest sequence of a stream
+			models.Index(fields=['stream', 'id'], name='feedevent_stream'),
+		]
+
+class ArchivedRecord(models.Model):
+	# Rows moved out of the hot tables by archive_records, readable by kind and id
+	kind = models.CharField(max_length=32) # report, prediction, notification, reportlike, ... (model name)
+	object_id = models.BigIntegerField()
+	timestamp = models.DateTimeField(db_index=True) # The row's own timestamp
+	data = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+	archived_at = models.DateTimeField(auto_now_add=True)
+
+	class Meta:
+		unique_together = ('kind', 'object_id')
@@ -0,0 +1,37 @@
+import base64
+from django.conf import settings
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+# Create your paginators here.
+def encode(item):
+	return base64.urlsafe_b64encode(f'{item.timestamp.isoformat()}|{item.id}'.encode()).decode()
+
+def decode(cursor):
+	try:
+		timestamp, id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+		timestamp = parse_datetime(timestamp)
+		id = int(id)
+	except (ValueError, UnicodeDecodeError):
+		raise ValueError('Invalid cursor')
+	if timestamp is None:
+		raise ValueError('Invalid cursor')
+	return timestamp, id
+
+def page_size(request):
+	try:
+		size = int(request.GET.get('page-size', settings.PAGE_SIZE))
+	except ValueError:
+		size = settings.PAGE_SIZE
+	return max(1, min(size, settings.MAX_PAGE_SIZE))
+
+def paginate(queryset, cursor=None, size=None):
+	# Keyset pagination, newest first: rows inserted meanwhile never shift a page
+	size = size or settings.PAGE_SIZE
+	queryset = queryset.order_by('-timestamp', '-id')
+	if cursor:
+		timestamp, id = decode(cursor)
+		queryset = queryset.filter(Q(timestamp__lt=timestamp) | Q(timestamp=timestamp, id__lt=id))
+	items = list(queryset[:size + 1])
+	next_cursor = encode(items[size - 1]) if len(items) > size else None
+	return items[:size], next_cursor
@@ -0,0 +1,38 @@
+from functools import lru_cache
+from rest_framework import serializers
+
+# Create your query planners here.
+def relations(serializer, prefix=''):
+	select_related = []
+	prefetch_related = []
+	for field in serializer.fields.values():
+		if field.source == '*' or '.' in field.source or isinstance(field, serializers.SerializerMethodField):
+			continue
+		path = prefix + field.source
+		if isinstance(field, serializers.ListSerializer):
+			prefetch_related.append(path)
+			nested_select, nested_prefetch = relations(field.child, f'{path}__')
+			prefetch_related.extend(nested_select + nested_prefetch)
+		elif isinstance(field, serializers.BaseSerializer):
+			select_related.append(path)
+			nested_select, nested_prefetch = relations(field, f'{path}__')
+			select_related.extend(nested_select)
+			prefetch_related.extend(nested_prefetch)
+		elif isinstance(field, serializers.ManyRelatedField):
+			prefetch_related.append(path)
+	return select_related, prefetch_related
+
+@lru_cache(maxsize=None)
+def plan_for(serializer_class):
+	select_related, prefetch_related = relations(serializer_class())
+	# select_related paths below one already joined are implied by it
+	select_related = [path for path in select_related if not any(other.startswith(f'{path}__') for other in select_related)]
+	return tuple(select_related), tuple(prefetch_related)
+
+def plan(queryset, serializer_class):
+	select_related, prefetch_related = plan_for(serializer_class)
+	if select_related:
+		queryset = queryset.select_related(*select_related)
+	if prefetch_related:
+		queryset = queryset.prefetch_related(*prefetch_related)
+	return queryset
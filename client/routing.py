@@ -6,4 +6,5 @@ websocket_urlpatterns = [
 	re_path(r'ws/reports/$', consumers.ReportConsumer.as_asgi()),
 	re_path(r'ws/predictions/$', consumers.PredictionConsumer.as_asgi()),
 	re_path(r'ws/notifications/$', consumers.NotificationConsumer.as_asgi()),
+	re_path(r'ws/ingest/$', consumers.IngestConsumer.as_asgi()),
 ]
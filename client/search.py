@@ -0,0 +1,79 @@
+from datetime import timedelta
+from functools import lru_cache
+from django.db import connection, connections, transaction, DatabaseError
+from django.db.models import BooleanField, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+from django.utils import timezone
+from .models import Report
+
+TABLE = Report._meta.db_table
+FTS_TABLE = f'{TABLE}_fts'
+# The query repeats this expression exactly so PostgreSQL uses the index built on it. Columns are
+# qualified, the planned querysets join client_profile, which has a location column of its own
+VECTOR = f"to_tsvector('english'::regconfig, coalesce({TABLE}.description, '') || ' ' || coalesce({TABLE}.location, ''))"
+
+# Create your search helpers here.
+def install(using='default'):
+	database = connections[using]
+	with database.cursor() as cursor:
+		if database.vendor == 'postgresql':
+			cursor.execute(f'CREATE INDEX IF NOT EXISTS {TABLE}_search ON {TABLE} USING gin (({VECTOR}))')
+			try:
+				with transaction.atomic(using=using):
+					cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+					cursor.execute(f'CREATE INDEX IF NOT EXISTS {TABLE}_location_trgm ON {TABLE} USING gin (location gin_trgm_ops)')
+			except DatabaseError:
+				# Needs a role allowed to create extensions, full-text search works without it
+				pass
+		elif database.vendor == 'sqlite':
+			cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+			exists = cursor.fetchone() is not None
+			# External content table kept in step with the reports by triggers
+			cursor.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(description, location, content='{TABLE}', content_rowid='id')")
+			cursor.execute(f'''CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_insert AFTER INSERT ON {TABLE} BEGIN
+				INSERT INTO {FTS_TABLE}(rowid, description, location) VALUES (new.id, new.description, new.location);
+			END''')
+			cursor.execute(f'''CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete AFTER DELETE ON {TABLE} BEGIN
+				INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, description, location) VALUES ('delete', old.id, old.description, old.location);
+			END''')
+			cursor.execute(f'''CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_update AFTER UPDATE OF description, location ON {TABLE} BEGIN
+				INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, description, location) VALUES ('delete', old.id, old.description, old.location);
+				INSERT INTO {FTS_TABLE}(rowid, description, location) VALUES (new.id, new.description, new.location);
+			END''')
+			if not exists:
+				cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+@lru_cache(maxsize=None)
+def has_trigram():
+	with connection.cursor() as cursor:
+		cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+		return cursor.fetchone() is not None
+
+def matching(query):
+	if connection.vendor == 'postgresql':
+		tsquery = "websearch_to_tsquery('english', %s)"
+		if has_trigram():
+			match = RawSQL(f'({VECTOR} @@ {tsquery} OR {TABLE}.location %% %s)', [query, query], output_field=BooleanField())
+			rank = RawSQL(f'ts_rank({VECTOR}, {tsquery}) + similarity({TABLE}.location, %s)', [query, query], output_field=FloatField())
+		else:
+			match = RawSQL(f'{VECTOR} @@ {tsquery}', [query], output_field=BooleanField())
+			rank = RawSQL(f'ts_rank({VECTOR}, {tsquery})', [query], output_field=FloatField())
+		return Report.objects.filter(match).annotate(rank=rank)
+	if connection.vendor == 'sqlite':
+		# Every word quoted, so user input is never read as FTS5 query syntax
+		terms = ' '.join('"{}"'.format(word.replace('"', '""')) for word in query.split())
+		match = RawSQL(f'{TABLE}.id IN (SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s)', [terms], output_field=BooleanField())
+		# bm25() is lower for better matches
+		rank = RawSQL(f'(SELECT -bm25({FTS_TABLE}) FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s AND rowid = {TABLE}.id)', [terms], output_field=FloatField())
+		return Report.objects.filter(match).annotate(rank=rank)
+	return Report.objects.filter(Q(description__icontains=query) | Q(location__icontains=query)).annotate(rank=Value(0.0))
+
+def search(query, report_type=None, status=None, hours=None, limit=20):
+	reports = matching(query)
+	if report_type:
+		reports = reports.filter(report_type=report_type)
+	if status:
+		reports = reports.filter(status=status)
+	if hours:
+		reports = reports.filter(timestamp__gte=timezone.now() - timedelta(hours=hours))
+	return reports.order_by('-rank', '-timestamp', '-id')[:limit]
@@ -0,0 +1,126 @@
+import gc
+import os
+import threading
+from pathlib import Path
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+from .inference import MicroBatcher
+from .models import Report, LocationSentiment
+
+_model = None
+_model_lock = threading.Lock()
+
+# Create your sentiment helpers here.
+def load_model(quantize=None):
+	# Tokenizer threads do not survive a fork, keep them off in case this process is forked later
+	os.environ.setdefault('TOKENIZERS_PARALLELISM', 'false')
+	from transformers import pipeline
+	if quantize is None:
+		quantize = settings.SENTIMENT_QUANTIZE
+	if not quantize:
+		return pipeline('sentiment-analysis', model=settings.SENTIMENT_MODEL, device=-1)
+	import torch
+	from transformers import AutoModelForSequenceClassification, AutoTokenizer
+	cache = Path(settings.SENTIMENT_CACHE_DIR) / f"{settings.SENTIMENT_MODEL.replace('/', '--')}-int8-torch{torch.__version__}.pt"
+	if cache.exists():
+		model = torch.load(cache, weights_only=False)
+	else:
+		model = AutoModelForSequenceClassification.from_pretrained(settings.SENTIMENT_MODEL)
+		model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+		cache.parent.mkdir(parents=True, exist_ok=True)
+		temporary = cache.with_suffix(f'.{os.getpid()}.tmp')
+		torch.save(model, temporary)
+		os.replace(temporary, cache)
+	tokenizer = AutoTokenizer.from_pretrained(settings.SENTIMENT_MODEL)
+	return pipeline('sentiment-analysis', model=model, tokenizer=tokenizer, device=-1)
+
+def get_model():
+	global _model
+	if _model is None:
+		with _model_lock:
+			if _model is None:
+				_model = load_model()
+	return _model
+
+def preload():
+	# Load the weights without running inference, so the thread pools are created in each worker after fork
+	get_model()
+	# Objects alive now are never touched by the collector again, which keeps their pages shared after fork
+	gc.freeze()
+
+def warm_up():
+	classify(['warm up'])
+
+def classify(texts, batch_size=None, model=None):
+	batch_size = batch_size or settings.SENTIMENT_BATCH_SIZE
+	if model is None:
+		model = get_model()
+	texts = [text or '' for text in texts]
+	# Bucket by length so every batch pads to roughly the same size
+	order = sorted(range(len(texts)), key=lambda index: len(texts[index]))
+	results = [None] * len(texts)
+	for start in range(0, len(order), batch_size):
+		indexes = order[start:start + batch_size]
+		outputs = model(
+			[texts[index] for index in indexes],
+			batch_size=len(indexes),
+			truncation=True,
+			max_length=settings.SENTIMENT_MAX_LENGTH
+		)
+		for index, output in zip(indexes, outputs):
+			results[index] = output
+	return results
+
+# Shared by every request in this process, so concurrent callers are classified together
+service = MicroBatcher(
+	lambda texts: classify(texts, batch_size=settings.SENTIMENT_MAX_BATCH_SIZE),
+	max_batch_size=settings.SENTIMENT_MAX_BATCH_SIZE,
+	max_wait=settings.SENTIMENT_MAX_WAIT_MS / 1000,
+	max_queue_size=settings.SENTIMENT_MAX_QUEUE_SIZE
+)
+
+def label_reports(reports):
+	# Returns the reports this call labelled. Only rows still unlabelled are written and counted,
+	# a concurrent caller that picked up the same reports has counted the rest already
+	reports = list(reports)
+	if not reports:
+		return []
+	labelled = []
+	results = service.process(report.description for report in reports)
+	with transaction.atomic():
+		for report, result in zip(reports, results):
+			if Report.objects.filter(id=report.id, sentiment_label__isnull=True).update(sentiment_label=result['label'], sentiment_score=result['score']):
+				report.sentiment_label = result['label']
+				report.sentiment_score = result['score']
+				labelled.append(report)
+		LocationSentiment.objects.record(labelled)
+	return labelled
+
+def label_location(reports, location):
+	# Reports stored unlabelled while the service was busy never reach the counters on their own,
+	# label the ones for this location before the counters are read
+	location = LocationSentiment.objects.normalize(location)
+	pending = reports.filter(sentiment_label__isnull=True).only('id', 'description', 'location', 'timestamp', 'status')
+	# Every word has to appear, the exact comparison on the normalized name is left to Python
+	for word in location.split():
+		pending = pending.filter(location__icontains=word)
+	return label_reports(report for report in pending if LocationSentiment.objects.normalize(report.location) == location)
+
+def majority(positive, negative):
+	if positive > negative:
+		return 'POSITIVE'
+	elif negative > positive:
+		return 'NEGATIVE'
+	else:
+		return 'NEUTRAL'
+
+def verdict(labels):
+	labels = list(labels)
+	return majority(labels.count('POSITIVE'), labels.count('NEGATIVE'))
+
+def analysis(reports):
+	# Reports written before labels were stored are classified once, on demand
+	label_reports(reports.filter(sentiment_label__isnull=True).only('id', 'description', 'location', 'timestamp', 'status'))
+	counts = dict(reports.order_by().values_list('sentiment_label').annotate(count=Count('id')))
+	return majority(counts.get('POSITIVE', 0), counts.get('NEGATIVE', 0))
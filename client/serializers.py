@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
+from . import series
 from .models import Notification, Profile, Report, ReportLike, Prediction, PredictionLike, Feedback
 from .model_serializers.user_serializer import UserModelSerializer
 from .model_serializers.notification_serializer import NotificationModelSerializer
@@ -22,7 +23,7 @@ class NotificationSerializer(serializers.ModelSerializer):
 	class Meta:
 		model = Notification
 		fields = ['id', 'actor', 'report', 'report_like', 'prediction', 'prediction_like', 'feedback', 'action_type',
-					'message', 'timestamp', 'user']
+					'message', 'timestamp', 'broadcast', 'user']
 		read_only_fields = fields
 
 class ProfileSerializer(serializers.ModelSerializer):
@@ -37,16 +38,29 @@ class ProfileSerializer(serializers.ModelSerializer):
 	class Meta:
 		model = Profile
 		fields = ['id', 'phone_number', 'profile_picture', 'location', 'timestamp', 'last_modified',
-					'verification_status', 'notification_status', 'user']
+					'verification_status', 'notification_status', 'notifications_read_at', 'user']
 		read_only_fields = fields
 
-class ReportSerializer(serializers.ModelSerializer):
+class LikedByMeMixin:
+	# context['liked'] holds the ids the viewer liked on this page, looked up once by likes.liked
+	def get_liked_by_me(self, obj):
+		liked = self.context.get('liked')
+		# None when serialized for no one in particular, e.g. the cached feed and live events
+		return None if liked is None else obj.id in liked
+
+class ReportSerializer(LikedByMeMixin, serializers.ModelSerializer):
 	user = UserSerializer()
-	likes = ReportLikeModelSerializer(many=True)
+	sensor_series = serializers.SerializerMethodField()
+	liked_by_me = serializers.SerializerMethodField()
+
+	def get_sensor_series(self, obj):
+		# Downsampled, the raw samples are served by sensor-series/
+		return series.summary(obj.sensor_series)
+
 	class Meta:
 		model = Report
 		fields = ['id', 'location', 'latitude', 'longitude', 'report_type', 'description', 'timestamp', 'status',
-					'sensor_data', 'verification_status', 'rating', 'user', 'likes']
+					'sensor_data', 'sensor_series', 'verification_status', 'rating', 'user', 'like_count', 'liked_by_me']
 		read_only_fields = fields
 
 class ReportLikeSerializer(serializers.ModelSerializer):
@@ -55,13 +69,13 @@ class ReportLikeSerializer(serializers.ModelSerializer):
 		fields = ['id', 'timestamp', 'report', 'user']
 		read_only_fields = fields
 
-class PredictionSerializer(serializers.ModelSerializer):
+class PredictionSerializer(LikedByMeMixin, serializers.ModelSerializer):
 	user = UserSerializer()
-	likes = PredictionLikeModelSerializer(many=True)
+	liked_by_me = serializers.SerializerMethodField()
 	class Meta:
 		model = Prediction
 		fields = ['id', 'predicted_event', 'generated_text', 'confidence_score', 'valid_until', 'ai_model_version',
-					'timestamp', 'user', 'report', 'likes']
+					'timestamp', 'user', 'report', 'like_count', 'liked_by_me']
 		read_only_fields = fields
 
 class PredictionLikeSerializer(serializers.ModelSerializer):
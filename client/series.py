@@ -0,0 +1,95 @@
+import json
+import struct
+import numpy as np
+from django.conf import settings
+
+# Layout: MAGIC, channel count, then per channel its name, sample count, first timestamp,
+# int32 gaps between timestamps in ms and float32 values, all little endian
+MAGIC = b'SNS1'
+HEADER = struct.Struct('<4sH')
+CHANNEL = struct.Struct('<IQ')
+
+# Create your sensor series helpers here.
+def pack(series):
+	# {'noise': [[timestamp_ms, value], ...], ...} or its JSON -> bytes; raises ValueError on anything else
+	if isinstance(series, str):
+		series = json.loads(series)
+	# The channel count is stored as an unsigned short
+	if not isinstance(series, dict) or not 0 < len(series) <= 0xFFFF:
+		raise ValueError('Invalid series')
+	parts = [HEADER.pack(MAGIC, len(series))]
+	for name, samples in series.items():
+		name = str(name).encode()
+		try:
+			samples = np.asarray(samples, dtype=np.float64).reshape(-1, 2)
+		except (TypeError, ValueError):
+			raise ValueError('Invalid series')
+		if len(name) > 255 or not len(samples) or not np.isfinite(samples[:, 0]).all():
+			raise ValueError('Invalid series')
+		samples = samples[np.argsort(samples[:, 0], kind='stable')]
+		if samples[0, 0] < 0 or samples[-1, 0] >= 2 ** 63:
+			raise ValueError('Invalid series')
+		timestamps = samples[:, 0].astype(np.int64)
+		gaps = np.diff(timestamps, prepend=timestamps[0])
+		# Checked once stored as float32, past its range a finite value turns into inf
+		with np.errstate(over='ignore'):
+			values = samples[:, 1].astype('<f4')
+		if gaps.max() > np.iinfo(np.int32).max or not np.isfinite(values).all():
+			raise ValueError('Invalid series')
+		parts += [
+			struct.pack('<B', len(name)), name,
+			CHANNEL.pack(len(samples), int(timestamps[0])),
+			gaps.astype('<i4').tobytes(),
+			values.tobytes(),
+		]
+	return b''.join(parts)
+
+def unpack(data):
+	# bytes -> {'noise': (int64 timestamps in ms, float32 values), ...}
+	data = bytes(data)
+	magic, channels = HEADER.unpack_from(data)
+	if magic != MAGIC:
+		raise ValueError('Invalid series')
+	offset = HEADER.size
+	series = {}
+	for _ in range(channels):
+		length = data[offset]
+		name = data[offset + 1:offset + 1 + length].decode()
+		offset += 1 + length
+		count, start = CHANNEL.unpack_from(data, offset)
+		offset += CHANNEL.size
+		gaps = np.frombuffer(data, dtype='<i4', count=count, offset=offset)
+		offset += 4 * count
+		values = np.frombuffer(data, dtype='<f4', count=count, offset=offset)
+		offset += 4 * count
+		series[name] = (start + np.cumsum(gaps, dtype=np.int64), values)
+	return series
+
+def downsample(timestamps, values, window):
+	# min/max/mean of each window ms wide, windows without samples are left out
+	buckets = (timestamps - timestamps[0]) // window
+	starts = np.flatnonzero(np.diff(buckets, prepend=-1))
+	counts = np.diff(np.append(starts, len(values)))
+	values = values.astype(np.float64)
+	return {
+		't': (timestamps[0] + buckets[starts] * window).tolist(),
+		'min': np.minimum.reduceat(values, starts).tolist(),
+		'max': np.maximum.reduceat(values, starts).tolist(),
+		'mean': (np.add.reduceat(values, starts) / counts).tolist(),
+		'count': counts.tolist(),
+	}
+
+def summary(data, points=None, window=None):
+	# Each channel cut into at most points windows unless a window width is given
+	if not data:
+		return None
+	points = points or settings.SENSOR_SUMMARY_POINTS
+	result = {}
+	for name, (timestamps, values) in unpack(data).items():
+		width = window or max(1, -(-int(timestamps[-1] - timestamps[0] + 1) // points))
+		result[name] = downsample(timestamps, values, width)
+	return result
+
+def raw(data):
+	# Full resolution, as it was sent
+	return { name: { 't': timestamps.tolist(), 'v': values.tolist() } for name, (timestamps, values) in unpack(data).items() }
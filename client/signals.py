@@ -0,0 +1,33 @@
+from django.contrib.auth.models import User
+from django.db.models import F
+from django.db.models.signals import post_save, post_delete, post_migrate
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+from . import search
+from .authentication import tokens
+from .models import Report, ReportLike, Prediction, PredictionLike
+
+# Create your signals here.
+@receiver(post_save, sender=Token)
+@receiver(post_delete, sender=Token)
+def forget_token(sender, instance, **kwargs):
+	tokens.delete(instance.key)
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_user(sender, instance, **kwargs):
+	tokens.delete_user(instance.id)
+
+@receiver(post_delete, sender=ReportLike)
+def uncount_report_like(sender, instance, **kwargs):
+	# Also runs for queryset deletes and cascades, so every removed row is uncounted
+	Report.objects.filter(pk=instance.report_id, like_count__gt=0).update(like_count=F('like_count') - 1)
+
+@receiver(post_delete, sender=PredictionLike)
+def uncount_prediction_like(sender, instance, **kwargs):
+	Prediction.objects.filter(pk=instance.prediction_id, like_count__gt=0).update(like_count=F('like_count') - 1)
+
+@receiver(post_migrate)
+def install_search(sender, using, **kwargs):
+	if sender.name == 'client':
+		search.install(using)
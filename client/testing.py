@@ -0,0 +1,19 @@
+from contextlib import contextmanager
+from django.db import connections
+from django.test.utils import CaptureQueriesContext
+
+# Create your test helpers here.
+@contextmanager
+def query_budget(limit, using='default'):
+	# Fails when the block runs more than limit queries, listing them
+	with CaptureQueriesContext(connections[using]) as context:
+		yield context
+	if len(context) > limit:
+		queries = '\n'.join(f'{index}. {query["sql"]}' for index, query in enumerate(context.captured_queries, start=1))
+		raise AssertionError(f'{len(context)} queries executed, the budget is {limit}:\n{queries}')
+
+class QueryBudgetMixin:
+	# For TestCase classes: self.assertQueryBudget(5, self.client.get, '/api/reports/?token=...')
+	def assertQueryBudget(self, limit, function, *args, **kwargs):
+		with query_budget(limit):
+			return function(*args, **kwargs)
@@ -1,3 +1,711 @@
-from django.test import TestCase
+import re
+import threading
+import time
+import unittest
+from unittest import mock
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from asgiref.sync import async_to_sync
+from channels.testing import WebsocketCommunicator
+from datetime import timedelta
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection, connections
+from django.db.models import Q
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from . import archive, broadcast, expiry, feed, geo, ingest, likes, pagination, search, sentiment, series
+from .authentication import TokenCache, tokens
+from .consumers import IngestConsumer
+from .inference import MicroBatcher, Overloaded
+from .dispatcher import dispatch
+from .models import ArchivedRecord, FeedEvent, Feedback, LocationSentiment, Notification, NotificationOutbox, Prediction, PredictionLike, Profile, Report, ReportLike
+from .planner import plan
+from .serializers import ReportSerializer
+from .testing import QueryBudgetMixin
 
 # Create your tests here.
+def create_user(username):
+	user = User.objects.create_user(username=username)
+	Profile.objects.create(user=user)
+	return user, Token.objects.create(user=user).key
+
+def create_report(user, index=0, **fields):
+	fields = {
+		'location': f'Location {index}',
+		'latitude': 51.5,
+		'longitude': -0.12,
+		'report_type': 'traffic',
+		'description': f'Report {index}',
+		'status': 'active',
+		**fields
+	}
+	return Report.objects.create(geohash=geo.encode(fields['latitude'], fields['longitude']), user=user, **fields)
+
+class QueryBudgetTests(QueryBudgetMixin, TestCase):
+	# Every row comes from a different user so an N+1 on the nested fields would blow the budget
+	rows = 30
+
+	@classmethod
+	def setUpTestData(cls):
+		cls.user, cls.token = create_user('reader')
+		authors = [create_user(f'author-{index}')[0] for index in range(cls.rows)]
+		cls.report = create_report(authors[0])
+		cls.prediction = Prediction.objects.create(predicted_event='Event', generated_text='Text', confidence_score=0.5, user=authors[0], report=cls.report)
+		cls.feedback = Feedback.objects.create(rating=5, comment='Comment', is_accurate=True, user=authors[0], report=cls.report)
+		for index, author in enumerate(authors):
+			report = create_report(author, index)
+			Prediction.objects.create(predicted_event=f'Event {index}', generated_text='Text', confidence_score=0.5, user=author, report=report)
+			Feedback.objects.create(rating=4, comment=f'Comment {index}', is_accurate=True, user=author, report=cls.report)
+			Feedback.objects.create(rating=4, comment=f'Comment {index}', is_accurate=True, user=author, prediction=cls.prediction)
+			Feedback.objects.create(rating=4, comment=f'Reply {index}', is_accurate=True, user=author, parent_feedback=cls.feedback)
+			notification = Notification.objects.create(actor=author, action_type='Report', message=f'Notification {index}', report=report)
+			notification.user.add(cls.user)
+
+	def setUp(self):
+		cache.clear()
+
+	def get(self, limit, path):
+		separator = '&' if '?' in path else '?'
+		response = self.assertQueryBudget(limit, self.client.get, f'/api/{path}{separator}token={self.token}')
+		self.assertTrue(response.json()['status'], response.json())
+		return response.json()
+
+	def test_reports(self):
+		self.assertEqual(len(self.get(4, 'reports/')['data']), 20)
+
+	def test_reports_cached(self):
+		self.get(4, 'reports/')
+		# Served from the cache, only the liked flags are read
+		self.get(2, 'reports/')
+
+	def test_reports_page(self):
+		content = self.get(4, 'reports/')
+		self.get(4, f'reports/?cursor={content["next"]}')
+
+	def test_predictions(self):
+		self.assertEqual(len(self.get(4, 'predictions/')['data']), 20)
+
+	def test_notifications(self):
+		self.assertEqual(len(self.get(6, 'notifications/')['data']), 20)
+
+	def test_report_feedbacks(self):
+		self.assertEqual(len(self.get(5, f'report-feedbacks/?report={self.report.id}')['data']), 20)
+
+	def test_prediction_feedbacks(self):
+		self.assertEqual(len(self.get(5, f'prediction-feedbacks/?prediction={self.prediction.id}')['data']), 20)
+
+	def test_replies(self):
+		self.assertEqual(len(self.get(5, f'replies/?feedback={self.feedback.id}')['data']), 20)
+
+class SeriesTests(SimpleTestCase):
+	def test_round_trip(self):
+		data = series.pack({ 'noise': [[2000, 3.5], [1000, 1.25], [3000, -2]], 'speed': [[5, 1]] })
+		unpacked = series.unpack(data)
+		self.assertEqual(unpacked['noise'][0].tolist(), [1000, 2000, 3000])
+		self.assertEqual(unpacked['noise'][1].tolist(), [1.25, 3.5, -2.0])
+		self.assertEqual(unpacked['speed'][0].tolist(), [5])
+
+	def test_accepts_json(self):
+		self.assertEqual(series.unpack(series.pack('{"noise": [[1, 2]]}'))['noise'][1].tolist(), [2.0])
+
+	def test_rejects_invalid(self):
+		for value in [{}, [], { 'noise': [] }, { 'noise': [[1, 'a']] }, { 'noise': [[1, 2, 3]] }, { 'noise': [[-1, 2]] }, { 'noise': [[1, float('nan')]] }, { 'noise': [[1, 1e39]] }, { 'noise': [[1, -1e39]] }, { 'noise': [[1e30, 1]] }, { 'noise': [[float('inf'), 1]] }, { 'noise': [[0, 1], [2 ** 40, 1]] }]:
+			with self.subTest(value=value), self.assertRaises(ValueError):
+				series.pack(value)
+
+	def test_channel_count(self):
+		# The count is stored in two bytes, one channel more has to be rejected rather than fail in struct
+		self.assertEqual(len(series.unpack(series.pack({ index: [[1, 2]] for index in range(0xFFFF) }))), 0xFFFF)
+		with self.assertRaises(ValueError):
+			series.pack({ index: [[1, 2]] for index in range(0x10000) })
+
+	def test_downsample(self):
+		timestamps = np.array([0, 10, 20, 250, 260])
+		values = np.array([1, 3, 2, 10, 20], dtype=np.float32)
+		self.assertEqual(series.downsample(timestamps, values, 100), {
+			't': [0, 200],
+			'min': [1.0, 10.0],
+			'max': [3.0, 20.0],
+			'mean': [2.0, 15.0],
+			'count': [3, 2],
+		})
+
+	def test_summary(self):
+		data = series.pack({ 'noise': [[index, index] for index in range(1000)] })
+		summary = series.summary(data, points=10)['noise']
+		self.assertEqual(len(summary['t']), 10)
+		self.assertEqual(sum(summary['count']), 1000)
+		self.assertIsNone(series.summary(None))
+
+class PaginationTests(SimpleTestCase):
+	def test_round_trip(self):
+		item = Report(id=42, timestamp=timezone.now())
+		self.assertEqual(pagination.decode(pagination.encode(item)), (item.timestamp, 42))
+
+	def test_invalid(self):
+		for cursor in ['', 'not a cursor', 'bm90aGluZw==', 'MjAyNHwx', 'MjAyNC0wMS0wMVQwMDowMDowMHxh']:
+			with self.subTest(cursor=cursor), self.assertRaises(ValueError):
+				pagination.decode(cursor)
+
+class GeoTests(TestCase):
+	def test_cells_cover_the_radius(self):
+		for latitude, longitude, radius in [(51.5, -0.12, 2), (0, 179.99, 5), (-33.9, 151.2, 50), (70, 20, 10), (75, 10, 800), (-80, 170, 300), (89.5, 0, 100)]:
+			cells = geo.cells(latitude, longitude, radius)
+			precision = len(next(iter(cells)))
+			for bearing in range(0, 360, 5):
+				# Points just inside the radius, stepped along a bearing
+				angle = radius * 0.99 / geo.EARTH_RADIUS
+				point_latitude = np.degrees(np.arcsin(np.sin(np.radians(latitude)) * np.cos(angle) + np.cos(np.radians(latitude)) * np.sin(angle) * np.cos(np.radians(bearing))))
+				point_longitude = longitude + np.degrees(np.arctan2(
+					np.sin(np.radians(bearing)) * np.sin(angle) * np.cos(np.radians(latitude)),
+					np.cos(angle) - np.sin(np.radians(latitude)) * np.sin(np.radians(point_latitude))
+				))
+				point_longitude = (point_longitude + 180) % 360 - 180
+				with self.subTest(latitude=latitude, longitude=longitude, bearing=bearing):
+					self.assertIn(geo.encode(point_latitude, point_longitude, precision), cells)
+
+	def test_near(self):
+		user, _ = create_user('author')
+		inside = create_report(user, latitude=51.5, longitude=-0.12)
+		close = create_report(user, latitude=51.51, longitude=-0.12)
+		create_report(user, latitude=51.6, longitude=-0.12)
+		create_report(user, latitude=-51.5, longitude=-0.12)
+		self.assertEqual(set(geo.near(Report.objects.all(), 51.5, -0.12, 2)), { inside, close })
+
+	def test_around_rejects_invalid_positions(self):
+		self.assertIsNone(geo.around({}))
+		self.assertEqual(geo.around({ 'latitude': '51.5', 'longitude': '-0.12', 'radius': '3' }), (51.5, -0.12, 3.0))
+		for params in [
+			{ 'latitude': '51.5', 'longitude': '-0.12', 'radius': 'nan' },
+			{ 'latitude': 'nan', 'longitude': '-0.12' },
+			{ 'latitude': '51.5', 'longitude': 'inf' },
+			{ 'latitude': '51.5', 'longitude': '-0.12', 'radius': '-1' },
+			{ 'latitude': '91', 'longitude': '-0.12' },
+			{ 'latitude': [1], 'longitude': '-0.12' },
+			{ 'latitude': '51.5', 'longitude': { 'a': 1 } },
+		]:
+			with self.subTest(params=params), self.assertRaises(ValueError):
+				geo.around(params)
+		with self.assertRaises(ValueError):
+			geo.cells(51, 0, float('nan'))
+
+	def test_views_answer_invalid_positions(self):
+		_, token = create_user('reader')
+		for path in ['reports', 'predictions']:
+			with self.subTest(path=path):
+				content = self.client.get(f'/api/{path}/', { 'latitude': '51.5', 'longitude': '0', 'radius': 'nan', 'token': token }).json()
+				self.assertEqual(content, { 'data': 'Invalid parameters', 'status': False })
+		content = self.client.post(f'/api/explore/?token={token}', { 'latitude': [1], 'longitude': 0 }, content_type='application/json').json()
+		self.assertEqual(content, { 'data': 'Invalid parameters', 'status': False })
+
+class MicroBatcherTests(SimpleTestCase):
+	def test_batches_concurrent_callers(self):
+		batches = []
+		def handler(items):
+			batches.append(list(items))
+			return [item * 2 for item in items]
+		batcher = MicroBatcher(handler, max_batch_size=8, max_wait=0.2, max_queue_size=64)
+		with ThreadPoolExecutor(4) as executor:
+			results = list(executor.map(lambda items: batcher.process(items, timeout=5), [[1], [2, 3], [4], [5, 6]]))
+		self.assertEqual(results, [[2], [4, 6], [8], [10, 12]])
+		self.assertLess(len(batches), 4)
+
+	def test_handler_errors_reach_the_caller(self):
+		def handler(items):
+			raise RuntimeError('broken')
+		batcher = MicroBatcher(handler, max_batch_size=8, max_wait=0, max_queue_size=64)
+		with self.assertRaisesRegex(RuntimeError, 'broken'):
+			batcher.process([1], timeout=5)
+
+	def test_overloaded(self):
+		release = threading.Event()
+		def handler(items):
+			release.wait(5)
+			return items
+		batcher = MicroBatcher(handler, max_batch_size=1, max_wait=0, max_queue_size=2)
+		with ThreadPoolExecutor(2) as executor:
+			running = executor.submit(batcher.process, [1], 5)
+			while batcher.pending or not running.running():
+				time.sleep(0.01)
+			queued = executor.submit(batcher.process, [2, 3], 5)
+			while batcher.pending < 2:
+				time.sleep(0.01)
+			self.assertRaises(Overloaded, batcher.process, [4], 5)
+			release.set()
+			self.assertEqual(queued.result(5), [2, 3])
+
+class FeedMergeTests(SimpleTestCase):
+	def test_keeps_created(self):
+		self.assertEqual(feed.merge({ 'action': 'created', 'report': { 'id': 1, 'like_count': 0 } }, { 'action': 'updated', 'report': { 'id': 1, 'like_count': 1 } }), { 'action': 'created', 'report': { 'id': 1, 'like_count': 1 } })
+
+	def test_newer_wins(self):
+		self.assertEqual(feed.merge({ 'action': 'updated', 'report': { 'id': 1 } }, { 'action': 'deleted', 'report': { 'id': 1 } }), { 'action': 'deleted', 'report': { 'id': 1 } })
+		self.assertEqual(feed.merge({ 'action': 'created', 'report': { 'id': 1 } }, { 'action': 'deleted', 'report': { 'id': 1 } }), { 'action': 'deleted', 'report': { 'id': 1 } })
+
+class SearchTests(TestCase):
+	@classmethod
+	def setUpTestData(cls):
+		cls.user, cls.token = create_user('reader')
+		create_report(cls.user, description='Heavy traffic on the bridge')
+
+	def search(self, hours):
+		return self.client.get('/api/search/', { 'q': 'traffic', 'hours': hours, 'token': self.token }).json()
+
+	def test_hours(self):
+		self.assertEqual(len(self.search('24')['data']), 1)
+		self.assertEqual(len(self.search('1e12')['data']), 1)
+		for hours in ['nan', 'inf', '-inf', '0', '-1', 'abc']:
+			with self.subTest(hours=hours):
+				self.assertEqual(self.search(hours), { 'data': 'Invalid parameters', 'status': False })
+
+	def test_postgresql_columns_are_qualified(self):
+		# Built for PostgreSQL whatever runs the tests, the planned queryset joins client_profile which has a location too
+		with mock.patch.object(connection, 'vendor', 'postgresql'), mock.patch('client.search.has_trigram', return_value=True):
+			sql = str(plan(search.search('traffic'), ReportSerializer).query)
+		self.assertIn('"client_profile"', sql)
+		self.assertIn('to_tsvector', sql)
+		self.assertEqual(re.findall(r'(?<![\w."])(?:location|description)\b', sql), [])
+
+class LikeStatusTests(TestCase):
+	@classmethod
+	def setUpTestData(cls):
+		cls.user, cls.token = create_user('reader')
+		cls.report = create_report(create_user('author')[0])
+
+	def test_statuses(self):
+		huge = str(2 ** 63)
+		content = self.client.get('/api/like-status/', { 'reports': f'{self.report.id},abc,²,{huge}', 'token': self.token }).json()
+		self.assertEqual(content['data']['reports'], [
+			{ 'id': self.report.id, 'liked': False },
+			{ 'id': 'abc', 'error': 'Invalid id' },
+			{ 'id': '²', 'error': 'Invalid id' },
+			{ 'id': 2 ** 63, 'error': 'Report not found' },
+		])
+
+	def test_like_unknown_ids(self):
+		for view in ['like-report', 'dislike-report']:
+			for report, data in [('abc', 'Invalid parameters'), ('²', 'Invalid parameters'), (str(2 ** 63), 'Report not found'), (str(self.report.id + 1), 'Report not found')]:
+				with self.subTest(view=view, report=report):
+					content = self.client.get(f'/api/{view}/', { 'report': report, 'token': self.token }).json()
+					if view == 'dislike-report' and data == 'Report not found':
+						self.assertEqual(content, { 'data': False, 'status': True })
+					else:
+						self.assertEqual(content, { 'data': data, 'status': False })
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'SQLite serializes writers, the race only exists on PostgreSQL')
+class LikeConcurrencyTests(TransactionTestCase):
+	threads = 8
+	rounds = 200
+
+	def test_double_taps(self):
+		# Every thread makes the same call in a round, no like may be lost or counted twice
+		owner, _ = create_user('owner')
+		liker, _ = create_user('liker')
+		report = create_report(owner)
+		barrier = threading.Barrier(self.threads)
+		added = []
+		removed = []
+		errors = []
+
+		def worker():
+			try:
+				for round in range(self.rounds):
+					barrier.wait()
+					if round % 2 == 0:
+						added.append(likes.like('reports', liker, report.id))
+					else:
+						removed.append(likes.unlike('reports', liker, report.id))
+			except Exception as error:
+				errors.append(error)
+				barrier.abort()
+			finally:
+				connections.close_all()
+
+		threads = [threading.Thread(target=worker) for _ in range(self.threads)]
+		for thread in threads:
+			thread.start()
+		for thread in threads:
+			thread.join()
+		self.assertEqual(errors, [])
+		self.assertEqual(added.count(True), self.rounds - self.rounds // 2)
+		self.assertEqual(removed.count(True), self.rounds // 2)
+		report.refresh_from_db(fields=['like_count'])
+		self.assertEqual(report.like_count, ReportLike.objects.filter(report=report).count())
+		self.assertEqual(report.like_count, 0)
+
+@mock.patch('client.ingest.label')
+class IngestTests(TestCase):
+	item = {
+		'location': 'Douala',
+		'latitude': '4.05',
+		'longitude': '9.7',
+		'report-type': 'traffic',
+		'description': 'Heavy traffic',
+		'sensor-data': { 'noise': 70 },
+		'rating': '3',
+	}
+
+	@classmethod
+	def setUpTestData(cls):
+		cls.user, cls.token = create_user('author')
+
+	def test_validate(self, label):
+		self.assertIsNotNone(ingest.validate(self.item, self.user)[0])
+		for change, error in [({ 'rating': 'inf' }, 'Invalid parameters'), ({ 'rating': 'nan' }, 'Invalid parameters'), ({ 'latitude': '91' }, 'Invalid position'), ({ 'latitude': 'nan' }, 'Invalid position'), ({ 'sensor-data': None }, 'Fields are required'), ({ 'sensor-series': { index: [[1, 2]] for index in range(0x10000) } }, 'Invalid parameters')]:
+			with self.subTest(change=change):
+				self.assertEqual(ingest.validate({ **self.item, **change }, self.user), (None, error))
+
+	def test_submit_report_validates(self, label):
+		content = self.client.post(f'/api/submit-report/?token={self.token}', { **self.item, 'rating': 'inf' }, content_type='application/json').json()
+		self.assertEqual(content, { 'data': 'Invalid parameters', 'status': False })
+		content = self.client.post(f'/api/submit-report/?token={self.token}', self.item, content_type='application/json').json()
+		self.assertEqual(content, { 'data': 'Report has been submitted', 'status': True })
+		self.assertEqual(Report.objects.get().geohash, geo.encode(4.05, 9.7))
+
+	def test_push_failure_after_commit(self, label):
+		# Stored rows are reported stored, or the client would send them again
+		with mock.patch('client.feed.push', side_effect=RuntimeError('channel layer down')), self.assertLogs('client.ingest', 'ERROR') as logs:
+			results = ingest.create_reports(self.user, [self.item, { **self.item, 'rating': 'nan' }])
+		self.assertIn('channel layer down', logs.output[0])
+		self.assertEqual(results, [{ 'id': Report.objects.get().id }, { 'error': 'Invalid parameters' }])
+
+@mock.patch('client.ingest.label')
+class IngestConsumerTests(TransactionTestCase):
+	def setUp(self):
+		self.user, self.token = create_user('device')
+
+	async def exchange(self, reports):
+		communicator = WebsocketCommunicator(IngestConsumer.as_asgi(), f'/ws/ingest/?token={self.token}')
+		connected, _ = await communicator.connect()
+		self.assertTrue(connected)
+		credit = (await communicator.receive_json_from())['credit']
+		for seq, report in enumerate(reports, start=1):
+			await communicator.send_json_to({ 'seq': seq, 'report': report })
+		response = await communicator.receive_json_from(timeout=5)
+		await communicator.disconnect()
+		return credit, response
+
+	def test_failed_batch_returns_credit(self, label):
+		label.side_effect = RuntimeError('model crashed')
+		credit, response = async_to_sync(self.exchange)([IngestTests.item] * 2)
+		self.assertEqual(response, { 'ack': 2, 'results': [{ 'seq': 1, 'error': 'Not stored' }, { 'seq': 2, 'error': 'Not stored' }], 'credit': 2 })
+		self.assertFalse(Report.objects.exists())
+
+	def test_push_failure_is_acked_with_ids(self, label):
+		with mock.patch('client.feed.push', side_effect=RuntimeError('channel layer down')):
+			credit, response = async_to_sync(self.exchange)([IngestTests.item])
+		self.assertEqual(response['results'], [{ 'seq': 1, 'id': Report.objects.get().id }])
+
+class BroadcasterTests(SimpleTestCase):
+	def test_flush_sends_coalesced_events(self):
+		frames = []
+		async def publish(batch):
+			frames.extend(batch)
+		broadcaster = broadcast.Broadcaster(window=60, max_latency=60)
+		key = lambda event: event['report']['id']
+		with mock.patch('client.broadcast.publish', publish):
+			broadcaster.send('reports', 'send_report', [{ 'action': 'created', 'report': { 'id': 1, 'like_count': 0 } }], key=key, merge=feed.merge)
+			broadcaster.send('reports', 'send_report', [{ 'action': 'updated', 'report': { 'id': 1, 'like_count': 1 } }, { 'action': 'created', 'report': { 'id': 2 } }], key=key, merge=feed.merge)
+			self.assertEqual(frames, [])
+			broadcaster.flush()
+		self.assertEqual(frames, [(('reports', 'send_report'), [
+			{ 'action': 'created', 'report': { 'id': 1, 'like_count': 1 } },
+			{ 'action': 'created', 'report': { 'id': 2 } },
+		])])
+
+class FeedPushTests(TestCase):
+	def test_push_records_replayable_events(self):
+		report = create_report(create_user('author')[0])
+		since = feed.latest('reports')
+		with mock.patch('client.feed.broadcaster.send') as send:
+			feed.push('reports', 'created', [report])
+		events = feed.replay('reports', since)['events']
+		self.assertEqual([event['report']['id'] for event in events], [report.id])
+		self.assertEqual(send.call_args.args[2], events)
+
+def positive(texts):
+	return [{ 'label': 'POSITIVE', 'score': 0.9 } for _ in texts]
+
+class LocationSentimentTests(TestCase):
+	@classmethod
+	def setUpTestData(cls):
+		cls.user, _ = create_user('author')
+
+	def test_create_expire_and_relabel(self):
+		report = create_report(self.user, location='Douala', sentiment_label='POSITIVE', sentiment_score=0.9)
+		create_report(self.user, location='Douala', status='expired', sentiment_label='NEGATIVE', sentiment_score=0.9)
+		self.assertEqual(LocationSentiment.objects.totals(' DOUALA '), (1, 0))
+		report.status = 'expired'
+		report.save()
+		self.assertEqual(LocationSentiment.objects.totals('douala'), (0, 0))
+		report.status = 'active'
+		report.save()
+		self.assertEqual(LocationSentiment.objects.totals('douala'), (1, 0))
+		report.sentiment_label = 'NEGATIVE'
+		report.save()
+		self.assertEqual(LocationSentiment.objects.totals('douala'), (0, 1))
+
+	@mock.patch('client.sentiment.service.process', side_effect=positive)
+	def test_concurrent_labelling_counts_once(self, process):
+		create_report(self.user, location='Exp Town')
+		create_report(self.user, location='exp  town')
+		# Both callers read the same pending reports before either writes
+		first, second = [list(Report.objects.filter(sentiment_label__isnull=True)) for _ in range(2)]
+		self.assertEqual(len(sentiment.label_reports(first)), 2)
+		self.assertEqual(sentiment.label_reports(second), [])
+		self.assertEqual(LocationSentiment.objects.totals('exp town'), (2, 0))
+
+	@mock.patch('client.sentiment.service.process', side_effect=positive)
+	def test_label_location(self, process):
+		create_report(self.user, location='Exp  Town')
+		create_report(self.user, location='Exp Townsend')
+		create_report(self.user, location='Elsewhere')
+		self.assertEqual([report.location for report in sentiment.label_location(Report.objects.all(), 'exp town')], ['Exp  Town'])
+		self.assertEqual(Report.objects.filter(sentiment_label__isnull=True).count(), 2)
+		self.assertEqual(LocationSentiment.objects.totals('Exp Town'), (1, 0))
+
+@mock.patch('client.feed.broadcaster')
+@override_settings(REPORT_TTL_HOURS=24, REPORT_TTL_BY_TYPE={})
+class ExpiryTests(TestCase):
+	@classmethod
+	def setUpTestData(cls):
+		cls.user, _ = create_user('author')
+
+	def submitted(self, hours, **fields):
+		report = create_report(self.user, **fields)
+		Report.objects.filter(id=report.id).update(timestamp=timezone.now() - timedelta(hours=hours))
+		return Report.objects.get(id=report.id)
+
+	def due(self):
+		return set(expiry.due(timezone.now()).values_list('id', flat=True))
+
+	def test_due_without_types(self, broadcaster):
+		# No per-type TTLs leaves an empty exclusion, which has to keep every type
+		old = self.submitted(25, report_type='traffic')
+		other = self.submitted(25, report_type='noise')
+		self.submitted(23)
+		self.submitted(25, status='expired')
+		self.assertEqual(self.due(), { old.id, other.id })
+
+	def test_due_by_type(self, broadcaster):
+		traffic = self.submitted(3, report_type='traffic')
+		self.submitted(1, report_type='traffic')
+		self.submitted(3, report_type='noise')
+		noise = self.submitted(25, report_type='noise')
+		with override_settings(REPORT_TTL_BY_TYPE={ 'traffic': 2.0 }):
+			self.assertEqual(self.due(), { traffic.id, noise.id })
+
+	def test_batches_oldest_first(self, broadcaster):
+		reports = [self.submitted(hours) for hours in (30, 28, 26)]
+		self.assertEqual(expiry.expire(2), 2)
+		self.assertEqual(list(Report.objects.filter(status='expired').order_by('id').values_list('id', flat=True)), [reports[0].id, reports[1].id])
+		self.assertEqual(expiry.expire(2), 1)
+		self.assertEqual(expiry.expire(2), 0)
+
+	@override_settings(REPORT_TTL_BY_TYPE={ 'traffic': 2.0 })
+	def test_counters_and_feed(self, broadcaster):
+		recent = self.submitted(3, location='Douala')
+		# Labelled once backdated, so it is counted in the bucket it was submitted in
+		recent.sentiment_label = 'POSITIVE'
+		recent.save()
+		old = self.submitted(30, report_type='noise')
+		self.assertEqual(LocationSentiment.objects.totals('douala'), (1, 0))
+		self.assertEqual(expiry.expire(10), 2)
+		self.assertEqual(LocationSentiment.objects.totals('douala'), (0, 0))
+		# Only the report still inside the 24h feeds is sent as a delta
+		events = list(FeedEvent.objects.filter(stream='reports', action='updated'))
+		self.assertEqual([(event.object_id, event.payload['status']) for event in events], [(recent.id, 'expired')])
+		self.assertFalse(FeedEvent.objects.filter(object_id=old.id, action='updated').exists())
+		self.assertEqual(broadcaster.send.call_count, 1)
+
+class TokenCacheTests(TestCase):
+	def setUp(self):
+		tokens.clear()
+		self.user, self.token = create_user('holder')
+
+	def get(self, token):
+		# The response and how many times the token table was read to answer it
+		with CaptureQueriesContext(connection) as queries:
+			content = self.client.get('/api/read-notifications/', { 'token': token }).json()
+		return content['data'], sum(Token._meta.db_table in query['sql'] for query in queries)
+
+	def test_repeat_requests_are_served_from_the_cache(self):
+		self.assertEqual(self.get(self.token), ('Notifications marked as read', 1))
+		self.assertEqual(self.get(self.token), ('Notifications marked as read', 0))
+
+	def test_deleted_token(self):
+		self.get(self.token)
+		Token.objects.get(key=self.token).delete()
+		self.assertEqual(self.get(self.token)[0], 'Invalid token')
+
+	def test_rotated_token(self):
+		self.get(self.token)
+		Token.objects.filter(key=self.token).delete()
+		rotated = Token.objects.create(user=self.user).key
+		self.assertEqual(self.get(self.token)[0], 'Invalid token')
+		self.assertEqual(self.get(rotated)[0], 'Notifications marked as read')
+
+	def test_lru_and_ttl(self):
+		cache = TokenCache(2, 60)
+		with mock.patch('client.authentication.time.monotonic', return_value=0):
+			cache.set('a', self.user)
+			cache.set('b', self.user)
+			self.assertEqual(cache.get('a'), self.user)
+			# b is now the least recently used
+			cache.set('c', self.user)
+			self.assertIsNone(cache.get('b'))
+			self.assertIsNotNone(cache.get('a'))
+			# Every caller gets its own copy
+			cache.get('a').username = 'changed'
+			self.assertEqual(cache.get('a').username, 'holder')
+		with mock.patch('client.authentication.time.monotonic', return_value=61):
+			self.assertIsNone(cache.get('a'))
+
+class NotificationFeedTests(TestCase):
+	@classmethod
+	def setUpTestData(cls):
+		now = timezone.now()
+		cls.user, cls.token = create_user('reader')
+		cls.other, _ = create_user('other')
+		User.objects.filter(id=cls.user.id).update(date_joined=now - timedelta(days=10))
+		cls.user.refresh_from_db()
+		notify = lambda message, days, broadcast=False: Notification.objects.create(actor=cls.other, action_type='Report', message=message, broadcast=broadcast, timestamp=now - timedelta(days=days))
+		cls.before_joining = notify('Before joining', 20, True)
+		cls.old_broadcast = notify('Old broadcast', 5, True)
+		cls.new_broadcast = notify('New broadcast', 1, True)
+		cls.old_targeted = notify('Old targeted', 6)
+		cls.old_targeted.user.add(cls.user)
+		cls.new_targeted = notify('New targeted', 2)
+		cls.new_targeted.user.add(cls.user, cls.other)
+		cls.elsewhere = notify('Elsewhere', 1)
+		cls.elsewhere.user.add(cls.other)
+
+	def ids(self, **params):
+		content = self.client.get('/api/notifications/', { 'token': self.token, **params }).json()
+		self.assertTrue(content['status'])
+		return { item['id'] for item in content['data'] }
+
+	def test_for_user(self):
+		# Broadcasts only from the day the user joined, targeted rows only for their recipients
+		self.assertEqual(set(Notification.objects.for_user(self.user).values_list('id', flat=True)), { self.old_broadcast.id, self.new_broadcast.id, self.old_targeted.id, self.new_targeted.id })
+		self.assertEqual(set(Notification.objects.for_user(self.other).values_list('id', flat=True)), { self.new_targeted.id, self.elsewhere.id })
+		self.assertEqual(self.ids(), { self.old_broadcast.id, self.new_broadcast.id, self.old_targeted.id, self.new_targeted.id })
+
+	def test_unread(self):
+		# Nothing read yet, so everything is unread
+		self.assertEqual(self.ids(unread='true'), self.ids())
+		Profile.objects.filter(user=self.user).update(notifications_read_at=timezone.now() - timedelta(days=3))
+		self.assertEqual(self.ids(unread='true'), { self.new_broadcast.id, self.new_targeted.id })
+		self.assertEqual(len(self.ids()), 4)
+		self.assertTrue(self.client.get('/api/read-notifications/', { 'token': self.token }).json()['status'])
+		self.assertEqual(self.ids(unread='true'), set())
+
+@mock.patch('client.dispatcher.broadcaster')
+class DispatchTests(TestCase):
+	@classmethod
+	def setUpTestData(cls):
+		cls.actor, _ = create_user('actor')
+		cls.first, _ = create_user('first')
+		cls.second, _ = create_user('second')
+		cls.report = create_report(cls.actor)
+		# The report queued its own broadcast, start from an empty outbox
+		NotificationOutbox.objects.all().delete()
+
+	def test_dispatch(self, broadcaster):
+		broadcast = NotificationOutbox.objects.create(actor=self.actor, report=self.report, action_type='Report', message='Broadcast', broadcast=True, recipients=[self.first.id])
+		targeted = NotificationOutbox.objects.create(actor=self.actor, report=self.report, action_type='ReportLike', message='Targeted', recipients=[self.first.id, self.second.id, None])
+		later = NotificationOutbox.objects.create(actor=self.actor, action_type='Feedback', message='Later', recipients=[self.second.id])
+		self.assertEqual(dispatch(2), 2)
+
+		# Oldest entries first, copied over and taken off the outbox in the same transaction
+		self.assertEqual(list(NotificationOutbox.objects.values_list('id', flat=True)), [later.id])
+		notifications = list(Notification.objects.order_by('id'))
+		self.assertEqual(
+			[(notification.actor_id, notification.report_id, notification.action_type, notification.message, notification.broadcast, notification.timestamp) for notification in notifications],
+			[(self.actor.id, self.report.id, entry.action_type, entry.message, entry.broadcast, entry.timestamp) for entry in (broadcast, targeted)]
+		)
+		# Broadcasts get no recipient rows, targeted ones one per user
+		self.assertEqual(list(notifications[0].user.all()), [])
+		self.assertEqual(set(notifications[1].user.values_list('id', flat=True)), { self.first.id, self.second.id })
+		self.assertCountEqual(broadcaster.send.call_args_list, [
+			mock.call('notifications', 'send_notifications', [{ 'data': 'Broadcast' }]),
+			mock.call(f'user_{self.first.id}', 'send_notifications', [{ 'data': 'Targeted' }]),
+			mock.call(f'user_{self.second.id}', 'send_notifications', [{ 'data': 'Targeted' }]),
+		])
+
+		broadcaster.send.reset_mock()
+		self.assertEqual(dispatch(2), 1)
+		self.assertFalse(NotificationOutbox.objects.exists())
+		broadcaster.send.assert_called_once_with(f'user_{self.second.id}', 'send_notifications', [{ 'data': 'Later' }])
+		self.assertEqual(dispatch(2), 0)
+
+@mock.patch('client.dispatcher.broadcaster')
+class ArchiveTests(TestCase):
+	def rows(self):
+		# Every row of every client table the archive may delete from, the auto-created recipient table included
+		skip = (ArchivedRecord, LocationSentiment, FeedEvent)
+		return {
+			(model._meta.model_name, pk)
+			for model in apps.get_app_config('client').get_models(include_auto_created=True)
+			if not issubclass(model, skip)
+			for pk in model.objects.values_list('pk', flat=True)
+		}
+
+	def test_archive(self, broadcaster):
+		owner, token = create_user('owner')
+		liker, _ = create_user('liker')
+		old = create_report(owner, description='Old report')
+		prediction = Prediction.objects.create(predicted_event='Event', generated_text='Text', confidence_score=0.5, user=owner, report=old)
+		likes.like('reports', liker, old.id)
+		likes.like('predictions', liker, prediction.id)
+		feedback = Feedback.objects.create(rating=4, comment='Comment', is_accurate=True, user=liker, report=old)
+		Feedback.objects.create(rating=4, comment='Reply', is_accurate=True, user=owner, parent_feedback=feedback)
+		dispatch(100)
+		long_ago = timezone.now() - timedelta(days=40)
+		Report.objects.filter(id=old.id).update(timestamp=long_ago)
+		Notification.objects.update(timestamp=long_ago)
+		# Inside the horizon: a report with its own prediction, like and notification
+		recent = create_report(owner, description='Recent report')
+		recent_prediction = Prediction.objects.create(predicted_event='Event', generated_text='Text', confidence_score=0.5, user=owner, report=recent)
+		likes.like('reports', liker, recent.id)
+		dispatch(100)
+		self.assertTrue(Notification.user.through.objects.exists())
+
+		before = self.rows()
+		expected = self.rows_of(old, prediction, feedback)
+		horizon = timezone.now() - timedelta(days=30)
+		for model in archive.ROOTS:
+			# Small chunks, so the later roots find part of their cascade already gone
+			while archive.archive(model, horizon, 2):
+				pass
+		deleted = before - self.rows()
+
+		self.assertTrue(any(kind == 'notification_user' for kind, _ in expected))
+		# Exactly the old report's rows went, each into the archive, nothing inside the horizon was touched
+		self.assertEqual(deleted, expected)
+		self.assertEqual(set(ArchivedRecord.objects.values_list('kind', 'object_id')), deleted)
+		self.assertTrue(Report.objects.filter(id=recent.id).exists())
+		self.assertTrue(Prediction.objects.filter(id=recent_prediction.id).exists())
+
+		content = self.client.get('/api/report/', { 'report': old.id, 'token': token }).json()
+		self.assertEqual((content['status'], content['data']['id'], content['data']['description']), (True, old.id, 'Old report'))
+		content = self.client.get('/api/prediction/', { 'prediction': prediction.id, 'token': token }).json()
+		self.assertEqual((content['status'], content['data']['id'], content['data']['report']), (True, prediction.id, old.id))
+		content = self.client.get('/api/report/', { 'report': recent.id, 'token': token }).json()
+		self.assertEqual(content['data']['description'], 'Recent report')
+
+	def rows_of(self, report, prediction, feedback):
+		# The rows hanging off the old report, found before anything is deleted
+		notifications = Notification.objects.filter(Q(report=report) | Q(prediction=prediction) | Q(feedback__report=report) | Q(feedback__parent_feedback=feedback) | Q(report_like__report=report) | Q(prediction_like__prediction=prediction))
+		return {
+			('report', report.id), ('prediction', prediction.id),
+			*(('feedback', id) for id in Feedback.objects.filter(Q(report=report) | Q(parent_feedback=feedback)).values_list('id', flat=True)),
+			*(('reportlike', id) for id in ReportLike.objects.filter(report=report).values_list('id', flat=True)),
+			*(('predictionlike', id) for id in PredictionLike.objects.filter(prediction=prediction).values_list('id', flat=True)),
+			*(('notification', id) for id in notifications.values_list('id', flat=True)),
+			*(('notification_user', id) for id in Notification.user.through.objects.filter(notification__in=notifications).values_list('id', flat=True)),
+		}
@@ -13,15 +13,20 @@ urlpatterns = [
 	path('verify-email/<token>/', views.verify_email),
 	path('profile/', views.profile),
 	path('notifications/', views.notifications),
+	path('read-notifications/', views.read_notifications),
 	path('turn-on-notifications/', views.turn_on_notifications),
 	path('turn-off-notifications/', views.turn_off_notifications),
 	path('update-profile/', views.update_profile),
 	path('submit-report/', views.submit_report),
+	path('submit-reports/', views.submit_reports),
 	path('reports/', views.reports),
 	path('report/', views.report),
+	path('sensor-series/', views.sensor_series),
+	path('search/', views.search_reports),
 	path('submit-prediction/', views.submit_prediction),
 	path('predictions/', views.predictions),
 	path('prediction/', views.prediction),
+	path('like-status/', views.like_status),
 	path('like-report-check/', views.like_report_check),
 	path('like-report/', views.like_report),
 	path('dislike-report/', views.dislike_report),
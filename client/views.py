@@ -1,3 +1,5 @@
+import math
+from django.conf import settings
 from django.shortcuts import render
 from datetime import timedelta
 from django.utils import timezone
@@ -8,9 +10,7 @@ from django.core.mail import send_mail
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework.authtoken.models import Token
-from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
-from .models import Notification, Profile, Report, ReportLike, Prediction, PredictionLike, Feedback
+from .models import Notification, Profile, Report, LocationSentiment, ReportLike, Prediction, PredictionLike, Feedback
 from .serializers import (
 	UserSerializer,
 	NotificationSerializer,
@@ -21,29 +21,14 @@ from .serializers import (
 	PredictionLikeSerializer,
 	FeedbackSerializer
 )
-from transformers import pipeline
-
-model_name = 'distilbert-base-uncased-finetuned-sst-2-english'
-
-sentiment_analysis_model = pipeline('sentiment-analysis', model=model_name, device=-1)
+from .inference import Overloaded
+from . import archive, feed, geo, ingest, likes, search, series
+from .pagination import paginate, page_size
+from .authentication import token_required
+from .planner import plan
+from .sentiment import analysis, label_location, majority
 
 # Create your views here.
-def analysis(reports):
-	positive = 0
-	negative = 0
-	for report in reports:
-		analysis_description = sentiment_analysis_model(report.description)[0]
-		if analysis_description['label'] == 'POSITIVE':
-			positive += 1
-		elif analysis_description['label'] == 'NEGATIVE':
-			negative += 1
-	if positive > negative:
-		return 'POSITIVE'
-	elif negative > positive:
-		return 'NEGATIVE'
-	else:
-		return 'NEUTRAL'
-
 def reset_password_page(request):
 	return render(request, 'client/reset-password.html')
 
@@ -118,14 +103,9 @@ def reset_password(request, token):
 	return Response({ 'data': 'Password has been changed', 'status': True })
 
 @api_view(['GET'])
+@token_required
 def send_verification_email(request):
-	token = request.GET.get('token')
-	if not token:
-		return Response({ 'data': 'Invalid parameters', 'status': False })
-	if not Token.objects.filter(key=token).exists():
-		return Response({ 'data': 'Invalid token', 'status': False })
-	token = Token.objects.filter(key=token).first()
-	user = token.user
+	user = request.user
 	token = signing.dumps({ 'identification': user.id })
 	send_mail(
 		'Email Verification',
@@ -147,71 +127,66 @@ def verify_email(request, token):
 	profile = Profile.objects.filter(user=user).first()
 	profile.verification_status = True
 	profile.save()
+	feed.invalidate('reports')
+	feed.invalidate('predictions')
 	return Response({ 'data': 'Your account has been verified', 'status': True })
 
 @api_view(['GET'])
+@token_required
 def profile(request):
-	token = request.GET.get('token')
-	if not token:
-		return Response({ 'data': 'Invalid parameters', 'status': False })
-	if not Token.objects.filter(key=token).exists():
-		return Response({ 'data': 'Invalid token', 'status': False })
-	token = Token.objects.filter(key=token).first()
-	user = token.user
-	profile = Profile.objects.filter(user=user).first()
+	user = request.user
+	profile = plan(Profile.objects.filter(user=user), ProfileSerializer).first()
 	profile_serializer = ProfileSerializer(profile)
 	return Response({ 'data': profile_serializer.data, 'status': True })
 
 @api_view(['GET'])
+@token_required
 def notifications(request):
-	token = request.GET.get('token')
-	if not token:
-		return Response({ 'data': 'Invalid parameters', 'status': False })
-	if not Token.objects.filter(key=token).exists():
-		return Response({ 'data': 'Invalid token', 'status': False })
-	token = Token.objects.filter(key=token).first()
-	user = token.user
-	notifications = Notification.objects.filter(user=user).all()
+	user = request.user
+	profile = Profile.objects.filter(user=user).first()
+	notifications = Notification.objects.for_user(user)
+	if request.GET.get('unread') == 'true' and profile and profile.notifications_read_at:
+		notifications = notifications.filter(timestamp__gt=profile.notifications_read_at)
+	try:
+		notifications, next_cursor = paginate(plan(notifications, NotificationSerializer), request.GET.get('cursor'), page_size(request))
+	except ValueError:
+		return Response({ 'data': 'Invalid cursor', 'status': False })
 	notifications_serializer = NotificationSerializer(notifications, many=True)
-	return Response({ 'data': notifications_serializer.data, 'status': True })
+	return Response({ 'data': notifications_serializer.data, 'next': next_cursor, 'status': True })
 
 @api_view(['GET'])
+@token_required
+def read_notifications(request):
+	user = request.user
+	Profile.objects.filter(user=user).update(notifications_read_at=timezone.now())
+	return Response({ 'data': 'Notifications marked as read', 'status': True })
+
+@api_view(['GET'])
+@token_required
 def turn_on_notifications(request):
-	token = request.GET.get('token')
-	if not token:
-		return Response({ 'data': 'Invalid parameters', 'status': False })
-	if not Token.objects.filter(key=token).exists():
-		return Response({ 'data': 'Invalid token', 'status': False })
-	token = Token.objects.filter(key=token).first()
-	user = token.user
+	user = request.user
 	profile = Profile.objects.filter(user=user).first()
 	profile.notification_status = True
 	profile.save()
+	feed.invalidate('reports')
+	feed.invalidate('predictions')
 	return Response({ 'data': 'Notification is on', 'status': True })
 
 @api_view(['GET'])
+@token_required
 def turn_off_notifications(request):
-	token = request.GET.get('token')
-	if not token:
-		return Response({ 'data': 'Invalid parameters', 'status': False })
-	if not Token.objects.filter(key=token).exists():
-		return Response({ 'data': 'Invalid token', 'status': False })
-	token = Token.objects.filter(key=token).first()
-	user = token.user
+	user = request.user
 	profile = Profile.objects.filter(user=user).first()
 	profile.notification_status = False
 	profile.save()
+	feed.invalidate('reports')
+	feed.invalidate('predictions')
 	return Response({ 'data': 'Notification is off', 'status': True })
 
 @api_view(['POST'])
+@token_required
 def update_profile(request):
-	token = request.GET.get('token')
-	if not token:
-		return Response({ 'data': 'Invalid parameters', 'status': False })
-	if not Token.objects.filter(key=token).exists():
-		return Response({ 'data': 'Invalid token', 'status': False })
-	token = Token.objects.filter(key=token).first()
-	user = token.user
+	user = request.user
 	profile = Profile.objects.filter(user=user).first()
 	if request.data.get('first-name'):
 		user.first_name = request.data.get('first-name')
@@ -234,99 +209,111 @@ def update_profile(request):
 	profile.last_modified = timezone.now()
 	user.save()
 	profile.save()
+	feed.invalidate('reports')
+	feed.invalidate('predictions')
 	return Response({ 'data': 'Profile has been updated', 'status': True })
 
 @api_view(['POST'])
+@token_required
 def submit_report(request):
-	token = request.GET.get('token')
-	if not token:
-		return Response({ 'data': 'Invalid parameters', 'status': False })
-	if not Token.objects.filter(key=token).exists():
-		return Response({ 'data': 'Invalid token', 'status': False })
-	token = Token.objects.filter(key=token).first()
-	user = token.user
-	location = request.data.get('location')
-	latitude = request.data.get('latitude')
-	longitude = request.data.get('longitude')
-	report_type = request.data.get('report-type')
-	description = request.data.get('description')
-	sensor = request.data.get('sensor-data')
-	rating = request.data.get('rating')
-	if not location or not latitude or not longitude or not report_type or not description or not sensor or not rating:
-		return Response({ 'data': 'Fields are required', 'status': False })
-	report = Report.objects.create(
-		location=location,
-		latitude=latitude,
-		longitude=longitude,
-		report_type=report_type,
-		description=description,
-		sensor_data=sensor,
-		status='active',
-		rating=rating,
-		user=user
-	)
-	now = timezone.now()
-	last_24_hours = timezone.now() - timedelta(hours=24)
-	reports = Report.objects.filter(timestamp__gte=last_24_hours, timestamp__lte=now).all()[::-1]
-	reports_serializer = ReportSerializer(reports, many=True)
-	channel_layer = get_channel_layer()
-	async_to_sync(channel_layer.group_send)(
-		'reports',
-		{
-			'type': 'send_report',
-			'message': reports_serializer.data,
-		}
-	)
-	async_to_sync(channel_layer.group_send)(
-		'notifications',
-		{
-			'type': 'send_notification',
-			'message': {
-				'data': f'{report.user} reported {report.description} at {report.location}',
-			},
-		}
-	)
+	report, error = ingest.validate(request.data, request.user)
+	if report is None:
+		return Response({ 'data': error, 'status': False })
+	ingest.label([report])
+	report.save()
+	ingest.announce([report])
 	return Response({ 'data': 'Report has been submitted', 'status': True })
 
+@api_view(['POST'])
+@token_required
+def submit_reports(request):
+	items = request.data.get('reports')
+	if not isinstance(items, list) or not items:
+		return Response({ 'data': 'Fields are required', 'status': False })
+	if len(items) > settings.INGEST_MAX_BATCH:
+		return Response({ 'data': f'At most {settings.INGEST_MAX_BATCH} reports per request', 'status': False })
+	return Response({ 'data': ingest.create_reports(request.user, items), 'status': True })
+
 @api_view(['GET'])
+@token_required
 def reports(request):
-	token = request.GET.get('token')
-	if not token:
+	cursor = request.GET.get('cursor')
+	try:
+		around = geo.around(request.GET)
+	except ValueError:
 		return Response({ 'data': 'Invalid parameters', 'status': False })
-	if not Token.objects.filter(key=token).exists():
-		return Response({ 'data': 'Invalid token', 'status': False })
-	now = timezone.now()
-	last_24_hours = timezone.now() - timedelta(hours=24)
-	reports = Report.objects.filter(timestamp__gte=last_24_hours, timestamp__lte=now).all()[::-1]
-	reports_serializer = ReportSerializer(reports, many=True)
-	return Response({ 'data': reports_serializer.data, 'status': True })
+	if not cursor and not around and page_size(request) == settings.PAGE_SIZE:
+		content = feed.cached('reports')
+		return Response({ 'data': likes.mark('reports', request.user, content['data']), 'next': content['next'], 'status': True })
+	try:
+		reports, next_cursor = feed.page('reports', cursor, page_size(request), around, request.user)
+	except ValueError:
+		return Response({ 'data': 'Invalid cursor', 'status': False })
+	return Response({ 'data': reports, 'next': next_cursor, 'status': True })
 
 @api_view(['GET'])
+@token_required
+def search_reports(request):
+	query = request.GET.get('q', '').strip()
+	if not query:
+		return Response({ 'data': 'Fields are required', 'status': False })
+	try:
+		hours = float(request.GET['hours']) if request.GET.get('hours') else None
+	except ValueError:
+		return Response({ 'data': 'Invalid parameters', 'status': False })
+	if hours is not None:
+		if not math.isfinite(hours) or hours <= 0:
+			return Response({ 'data': 'Invalid parameters', 'status': False })
+		# Anything longer reaches back before the first report, and far enough overflows the date
+		hours = min(hours, 24 * 366 * 100)
+	results = list(plan(search.search(query, request.GET.get('report-type'), request.GET.get('status'), hours, page_size(request)), ReportSerializer))
+	liked = likes.liked('reports', request.user, [report.id for report in results])
+	report_serializer = ReportSerializer(results, many=True, context={ 'liked': liked })
+	return Response({ 'data': report_serializer.data, 'status': True })
+
+@api_view(['GET'])
+@token_required
 def report(request):
-	token = request.GET.get('token')
 	report = request.GET.get('report')
-	if not token or not report:
+	if not report:
 		return Response({ 'data': 'Invalid parameters', 'status': False })
-	if not Token.objects.filter(key=token).exists():
-		return Response({ 'data': 'Invalid token', 'status': False })
 	if not Report.objects.filter(id=report).exists():
+		archived = archive.lookup(Report, report) if likes.is_id(report) else None
+		if archived is not None:
+			return Response({ 'data': archived, 'status': True })
 		return Response({ 'data': 'Report not found', 'status': False })
-	report = Report.objects.filter(id=report).first()
-	report_serializer = ReportSerializer(report)
+	report = plan(Report.objects.filter(id=report), ReportSerializer).first()
+	report_serializer = ReportSerializer(report, context={ 'liked': likes.liked('reports', request.user, [report.id]) })
 	return Response({ 'data': report_serializer.data, 'status': True })
 
+@api_view(['GET'])
+@token_required
+def sensor_series(request):
+	report = request.GET.get('report')
+	if not report or not likes.is_id(report):
+		return Response({ 'data': 'Invalid parameters', 'status': False })
+	if not Report.objects.filter(id=report).exists():
+		return Response({ 'data': 'Report not found', 'status': False })
+	data = Report.objects.filter(id=report).values_list('sensor_series', flat=True).first()
+	if not data:
+		return Response({ 'data': 'No sensor series', 'status': False })
+	# ?window=<ms> for min/max/mean windows of that width, the raw samples otherwise
+	window = request.GET.get('window')
+	if window:
+		if not window.isascii() or not window.isdigit() or int(window) <= 0:
+			return Response({ 'data': 'Invalid parameters', 'status': False })
+		return Response({ 'data': series.summary(data, window=int(window)), 'status': True })
+	return Response({ 'data': series.raw(data), 'status': True })
+
 @api_view(['POST'])
+@token_required
 def submit_prediction(request):
-	token = request.GET.get('token')
 	report = request.GET.get('report')
-	if not token or not report:
+	if not report:
 		return Response({ 'data': 'Invalid parameters', 'status': False })
-	if not Token.objects.filter(key=token).exists():
-		return Response({ 'data': 'Invalid token', 'status': False })
 	if not Report.objects.filter(id=report).exists():
 		return Response({ 'data': 'Report not found', 'status': False })
-	token = Token.objects.filter(key=token).first()
-	user = token.user
+	user = request.user
 	report = Report.objects.filter(id=report).first()
 	predicted_event = request.data.get('predicted-event')
 	generated_text = request.data.get('generated-text')
@@ -344,349 +331,274 @@ def submit_prediction(request):
 		user=user,
 		report=report
 	)
-	now = timezone.now()
-	last_24_hours = timezone.now() - timedelta(hours=24)
-	predictions = Prediction.objects.filter(timestamp__gte=last_24_hours, timestamp__lte=now).all()[::-1]
-	predictions_serializer = PredictionSerializer(predictions, many=True)
-	channel_layer = get_channel_layer()
-	async_to_sync(channel_layer.group_send)(
-		'predictions',
-		{
-			'type': 'send_prediction',
-			'message': predictions_serializer.data,
-		}
-	)
-	async_to_sync(channel_layer.group_send)(
-		'notifications',
-		{
-			'type': 'send_notification',
-			'message': {
-				'data': f'{prediction.user} added prediction on {prediction.report.description}',
-			},
-		}
-	)
+	feed.push('predictions', 'created', [prediction])
 	return Response({ 'data': 'Prediction has been submitted', 'status': True })
 
 @api_view(['GET'])
+@token_required
 def predictions(request):
-	token = request.GET.get('token')
-	if not token:
+	cursor = request.GET.get('cursor')
+	try:
+		around = geo.around(request.GET)
+	except ValueError:
 		return Response({ 'data': 'Invalid parameters', 'status': False })
-	if not Token.objects.filter(key=token).exists():
-		return Response({ 'data': 'Invalid token', 'status': False })
-	now = timezone.now()
-	last_24_hours = timezone.now() - timedelta(hours=24)
-	predictions = Prediction.objects.filter(timestamp__gte=last_24_hours, timestamp__lte=now).all()[::-1]
-	predictions_serializer = PredictionSerializer(predictions, many=True)
-	return Response({ 'data': predictions_serializer.data, 'status': True })
+	if not cursor and not around and page_size(request) == settings.PAGE_SIZE:
+		content = feed.cached('predictions')
+		return Response({ 'data': likes.mark('predictions', request.user, content['data']), 'next': content['next'], 'status': True })
+	try:
+		predictions, next_cursor = feed.page('predictions', cursor, page_size(request), around, request.user)
+	except ValueError:
+		return Response({ 'data': 'Invalid cursor', 'status': False })
+	return Response({ 'data': predictions, 'next': next_cursor, 'status': True })
 
 @api_view(['GET'])
+@token_required
 def prediction(request):
-	token = request.GET.get('token')
 	prediction = request.GET.get('prediction')
-	if not token or not prediction:
+	if not prediction:
 		return Response({ 'data': 'Invalid parameters', 'status': False })
-	if not Token.objects.filter(key=token).exists():
-		return Response({ 'data': 'Invalid token', 'status': False })
 	if not Prediction.objects.filter(id=prediction).exists():
+		archived = archive.lookup(Prediction, prediction) if likes.is_id(prediction) else None
+		if archived is not None:
+			return Response({ 'data': archived, 'status': True })
 		return Response({ 'data': 'Prediction not found', 'status': False })
-	prediction = Prediction.objects.filter(id=prediction).first()
-	prediction_serializer = PredictionSerializer(prediction)
+	prediction = plan(Prediction.objects.filter(id=prediction), PredictionSerializer).first()
+	prediction_serializer = PredictionSerializer(prediction, context={ 'liked': likes.liked('predictions', request.user, [prediction.id]) })
 	return Response({ 'data': prediction_serializer.data, 'status': True })
 
 @api_view(['GET'])
+@token_required
 def like_report_check(request):
-	token = request.GET.get('token')
 	report = request.GET.get('report')
-	if not token or not report:
+	if not report:
 		return Response({ 'data': 'Invalid parameters', 'status': False })
-	if not Token.objects.filter(key=token).exists():
-		return Response({ 'data': 'Invalid token', 'status': False })
 	if not Report.objects.filter(id=report).exists():
 		return Response({ 'data': 'Report not found', 'status': False })
-	token = Token.objects.filter(key=token).first()
-	user = token.user
+	user = request.user
 	report = Report.objects.filter(id=report).first()
 	if ReportLike.objects.filter(report=report).filter(user=user).exists():
 		return Response({ 'data': True, 'status': True })
 	return Response({ 'data': False, 'status': True })
 
 @api_view(['GET'])
+@token_required
+def like_status(request):
+	# ?reports=1,2,3&predictions=4,5 answers for a whole feed page at once
+	ids = { kind: [id.strip() for id in request.GET.get(kind, '').split(',') if id.strip()] for kind in ('reports', 'predictions') }
+	if not any(ids.values()):
+		return Response({ 'data': 'Invalid parameters', 'status': False })
+	if any(len(kind_ids) > settings.MAX_PAGE_SIZE for kind_ids in ids.values()):
+		return Response({ 'data': 'Too many ids', 'status': False })
+	data = { kind: likes.statuses(kind, request.user, kind_ids) for kind, kind_ids in ids.items() if kind_ids }
+	return Response({ 'data': data, 'status': True })
+
+@api_view(['GET'])
+@token_required
 def like_report(request):
-	token = request.GET.get('token')
 	report = request.GET.get('report')
-	if not token or not report:
+	if not report or not likes.is_id(report):
 		return Response({ 'data': 'Invalid parameters', 'status': False })
-	if not Token.objects.filter(key=token).exists():
-		return Response({ 'data': 'Invalid token', 'status': False })
-	if not Report.objects.filter(id=report).exists():
+	changed = likes.like('reports', request.user, int(report))
+	if changed is None:
 		return Response({ 'data': 'Report not found', 'status': False })
-	token = Token.objects.filter(key=token).first()
-	user = token.user
-	report = Report.objects.filter(id=report).first()
-	if ReportLike.objects.filter(report=report).filter(user=user).exists():
-		return Response({ 'data': 'Bad request', 'status': False })
-	report_like = ReportLike.objects.create(report=report, user=user)
-	channel_layer = get_channel_layer()
-	async_to_sync(channel_layer.group_send)(
-		f'user_{str(report_like.report.user.id)}',
-		{
-			'type': 'send_notification',
-			'message': {
-				'data': f'{report_like.user.username} liked your report',
-			},
-		}
-	)
-	return Response({ 'data': True, 'status': True })
+	if changed:
+		feed.push('reports', 'updated', plan(Report.objects.filter(id=report), ReportSerializer))
+	return Response({ 'data': changed, 'status': True })
 
 @api_view(['GET'])
+@token_required
 def dislike_report(request):
-	token = request.GET.get('token')
 	report = request.GET.get('report')
-	if not token or not report:
+	if not report or not likes.is_id(report):
 		return Response({ 'data': 'Invalid parameters', 'status': False })
-	if not Token.objects.filter(key=token).exists():
-		return Response({ 'data': 'Invalid token', 'status': False })
-	if not Report.objects.filter(id=report).exists():
-		return Response({ 'data': 'Report not found', 'status': False })
-	token = Token.objects.filter(key=token).first()
-	user = token.user
-	report = Report.objects.filter(id=report).first()
-	if ReportLike.objects.filter(report=report).filter(user=user).exists():
-		ReportLike.objects.filter(report=report).filter(user=user).delete()
-		return Response({ 'data': True, 'status': True })
-	return Response({ 'data': 'Bad request', 'status': False })
+	changed = likes.unlike('reports', request.user, int(report))
+	if changed:
+		feed.push('reports', 'updated', plan(Report.objects.filter(id=report), ReportSerializer))
+	return Response({ 'data': changed, 'status': True })
 
 @api_view(['GET'])
+@token_required
 def like_prediction_check(request):
-	token = request.GET.get('token')
 	prediction = request.GET.get('prediction')
-	if not token or not prediction:
+	if not prediction:
 		return Response({ 'data': 'Invalid parameters', 'status': False })
-	if not Token.objects.filter(key=token).exists():
-		return Response({ 'data': 'Invalid token', 'status': False })
 	if not Prediction.objects.filter(id=prediction).exists():
 		return Response({ 'data': 'Prediction not found', 'status': False })
-	token = Token.objects.filter(key=token).first()
-	user = token.user
+	user = request.user
 	prediction = Prediction.objects.filter(id=prediction).first()
 	if PredictionLike.objects.filter(prediction=prediction).filter(user=user).exists():
 		return Response({ 'data': True, 'status': True })
 	return Response({ 'data': False, 'status': True })
 
 @api_view(['GET'])
+@token_required
 def like_prediction(request):
-	token = request.GET.get('token')
 	prediction = request.GET.get('prediction')
-	if not token or not prediction:
+	if not prediction or not likes.is_id(prediction):
 		return Response({ 'data': 'Invalid parameters', 'status': False })
-	if not Token.objects.filter(key=token).exists():
-		return Response({ 'data': 'Invalid token', 'status': False })
-	if not Prediction.objects.filter(id=prediction).exists():
+	changed = likes.like('predictions', request.user, int(prediction))
+	if changed is None:
 		return Response({ 'data': 'Prediction not found', 'status': False })
-	token = Token.objects.filter(key=token).first()
-	user = token.user
-	prediction = Prediction.objects.filter(id=prediction).first()
-	if PredictionLike.objects.filter(prediction=prediction).filter(user=user).exists():
-		return Response({ 'data': 'Bad request', 'status': False })
-	prediction_like = PredictionLike.objects.create(prediction=prediction, user=user)
-	channel_layer = get_channel_layer()
-	async_to_sync(channel_layer.group_send)(
-		'user_{prediction_like.prediction.user.id}',
-		{
-			'type': 'send_notification',
-			'message': {
-				'data': f'{prediction_like.user.username} liked your prediction',
-			},
-		}
-	)
-	return Response({ 'data': True, 'status': True })
+	if changed:
+		feed.push('predictions', 'updated', plan(Prediction.objects.filter(id=prediction), PredictionSerializer))
+	return Response({ 'data': changed, 'status': True })
 
 @api_view(['GET'])
+@token_required
 def dislike_prediction(request):
-	token = request.GET.get('token')
 	prediction = request.GET.get('prediction')
-	if not token or not prediction:
+	if not prediction or not likes.is_id(prediction):
 		return Response({ 'data': 'Invalid parameters', 'status': False })
-	if not Token.objects.filter(key=token).exists():
-		return Response({ 'data': 'Invalid token', 'status': False })
-	if not Prediction.objects.filter(id=prediction).exists():
-		return Response({ 'data': 'Prediction not found', 'status': False })
-	token = Token.objects.filter(key=token).first()
-	user = token.user
-	prediction = Prediction.objects.filter(id=prediction).first()
-	if PredictionLike.objects.filter(prediction=prediction).filter(user=user).exists():
-		PredictionLike.objects.filter(prediction=prediction).filter(user=user).delete()
-		return Response({ 'data': True, 'status': True })
-	return Response({ 'data': 'Bad request', 'status': False })
+	changed = likes.unlike('predictions', request.user, int(prediction))
+	if changed:
+		feed.push('predictions', 'updated', plan(Prediction.objects.filter(id=prediction), PredictionSerializer))
+	return Response({ 'data': changed, 'status': True })
 
 @api_view(['POST'])
+@token_required
 def submit_report_feedback(request):
-	token = request.GET.get('token')
 	report = request.GET.get('report')
-	if not token or not report:
+	if not report:
 		return Response({ 'data': 'Invalid parameters', 'status': False })
-	if not Token.objects.filter(key=token).exists():
-		return Response({ 'data': 'Invalid token', 'status': False })
 	if not Report.objects.filter(id=report).exists():
 		return Response({ 'data': 'Report not found', 'status': False })
-	token = Token.objects.filter(key=token).first()
-	user = token.user
+	user = request.user
 	report = Report.objects.filter(id=report).first()
 	rating = request.data.get('rating')
 	comment = request.data.get('comment')
 	is_accurate = request.data.get('is-accurate')
 	if not rating or not comment or not is_accurate:
 		return Response({ 'data': 'Fields are required', 'status': False })
-	feedback = Feedback.objects.create(
+	Feedback.objects.create(
 		rating=rating,
 		comment=comment,
 		is_accurate=is_accurate,
 		user=user,
 		report=report
 	)
-	channel_layer = get_channel_layer()
-	async_to_sync(channel_layer.group_send)(
-		f'user_{str(feedback.report.user.id)}',
-		{
-			'type': 'send_notification',
-			'message': {
-				'data': f'{feedback.user.username} added feedback on your report',
-			},
-		}
-	)
 	return Response({ 'data': 'Feedback has been submitted', 'status': True })
 
 @api_view(['GET'])
+@token_required
 def report_feedbacks(request):
-	token = request.GET.get('token')
 	report = request.GET.get('report')
-	if not token or not report:
+	if not report:
 		return Response({ 'data': 'Invalid parameters', 'status': False })
-	if not Token.objects.filter(key=token).exists():
-		return Response({ 'data': 'Invalid token', 'status': False })
 	if not Report.objects.filter(id=report).exists():
 		return Response({ 'data': 'Report not found', 'status': False })
 	report = Report.objects.filter(id=report).first()
-	feedbacks = report.feedbacks
+	try:
+		feedbacks, next_cursor = paginate(plan(report.feedbacks.all(), FeedbackSerializer), request.GET.get('cursor'), page_size(request))
+	except ValueError:
+		return Response({ 'data': 'Invalid cursor', 'status': False })
 	feedbacks_serializer = FeedbackSerializer(feedbacks, many=True)
-	return Response({ 'data': feedbacks_serializer.data, 'status': True })
+	return Response({ 'data': feedbacks_serializer.data, 'next': next_cursor, 'status': True })
 
 @api_view(['POST'])
+@token_required
 def submit_prediction_feedback(request):
-	token = request.GET.get('token')
 	prediction = request.GET.get('prediction')
-	if not token or not prediction:
+	if not prediction:
 		return Response({ 'data': 'Invalid parameters', 'status': False })
-	if not Token.objects.filter(key=token).exists():
-		return Response({ 'data': 'Invalid token', 'status': False })
 	if not Prediction.objects.filter(id=prediction).exists():
 		return Response({ 'data': 'Prediction not found', 'status': False })
-	token = Token.objects.filter(key=token).first()
-	user = token.user
+	user = request.user
 	prediction = Prediction.objects.filter(id=prediction).first()
 	rating = request.data.get('rating')
 	comment = request.data.get('comment')
 	is_accurate = request.data.get('is-accurate')
 	if not rating or not comment or not is_accurate:
 		return Response({ 'data': 'Fields are required', 'status': False })
-	feedback = Feedback.objects.create(
+	Feedback.objects.create(
 		rating=rating,
 		comment=comment,
 		is_accurate=is_accurate,
 		user=user,
 		prediction=prediction
 	)
-	channel_layer = get_channel_layer()
-	async_to_sync(channel_layer.group_send)(
-		f'user_{str(feedback.prediction.user.id)}',
-		{
-			'type': 'send_notification',
-			'message': {
-				'data': f'{feedback.user.username} added feedback on your prediction',
-			},
-		}
-	)
 	return Response({ 'data': 'Feedback has been submitted', 'status': True })
 
 @api_view(['GET'])
+@token_required
 def prediction_feedbacks(request):
-	token = request.GET.get('token')
 	prediction = request.GET.get('prediction')
-	if not token or not prediction:
+	if not prediction:
 		return Response({ 'data': 'Invalid parameters', 'status': False })
-	if not Token.objects.filter(key=token).exists():
-		return Response({ 'data': 'Invalid token', 'status': False })
 	if not Prediction.objects.filter(id=prediction).exists():
 		return Response({ 'data': 'Prediction not found', 'status': False })
 	prediction = Prediction.objects.filter(id=prediction).first()
-	feedbacks = prediction.feedbacks
+	try:
+		feedbacks, next_cursor = paginate(plan(prediction.feedbacks.all(), FeedbackSerializer), request.GET.get('cursor'), page_size(request))
+	except ValueError:
+		return Response({ 'data': 'Invalid cursor', 'status': False })
 	feedbacks_serializer = FeedbackSerializer(feedbacks, many=True)
-	return Response({ 'data': feedbacks_serializer.data, 'status': True })
+	return Response({ 'data': feedbacks_serializer.data, 'next': next_cursor, 'status': True })
 
 @api_view(['POST'])
+@token_required
 def submit_reply(request):
-	token = request.GET.get('token')
 	feedback = request.GET.get('feedback')
-	if not token or not feedback:
+	if not feedback:
 		return Response({ 'data': 'Invalid parameters', 'status': False })
-	if not Token.objects.filter(key=token).exists():
-		return Response({ 'data': 'Invalid token', 'status': False })
 	if not Feedback.objects.filter(id=feedback).exists():
 		return Response({ 'data': 'Invalid feedback', 'status': False })
-	token = Token.objects.filter(key=token).first()
-	user = token.user
+	user = request.user
 	feedback = Feedback.objects.filter(id=feedback).first()
 	comment = request.data.get('comment')
 	if not comment:
 		return Response({ 'data': 'Fields are required', 'status': False })
-	reply = Feedback.objects.create(
+	Feedback.objects.create(
 		comment=comment,
 		parent_feedback=feedback,
 		user=user
 	)
-	channel_layer = get_channel_layer()
-	async_to_sync(channel_layer.group_send)(
-		f'user_{str(reply.parent_feedback.user.id)}',
-		{
-			'type': 'send_notification',
-			'message': {
-				'data': f'{reply.user.username} replied to your feedback',
-			},
-		}
-	)
 	return Response({ 'data': 'Reply has been submitted', 'status': True })
 
 @api_view(['GET'])
+@token_required
 def replies(request):
-	token = request.GET.get('token')
 	feedback = request.GET.get('feedback')
-	if not token or not feedback:
+	if not feedback:
 		return Response({ 'data': 'Invalid parameters', 'status': False })
-	if not Token.objects.filter(key=token).exists():
-		return Response({ 'data': 'Invalid token', 'status': False })
 	if not Feedback.objects.filter(id=feedback).exists():
 		return Response({ 'data': 'Invalid feedback', 'status': False })
 	feedback = Feedback.objects.filter(id=feedback).first()
-	replies = feedback.replies
+	try:
+		replies, next_cursor = paginate(plan(feedback.replies.all(), FeedbackSerializer), request.GET.get('cursor'), page_size(request))
+	except ValueError:
+		return Response({ 'data': 'Invalid cursor', 'status': False })
 	replies_serializer = FeedbackSerializer(replies, many=True)
-	return Response({ 'data': replies_serializer.data, 'status': True })
+	return Response({ 'data': replies_serializer.data, 'next': next_cursor, 'status': True })
 
 @api_view(['POST'])
+@token_required
 def explore(request):
-	token = request.GET.get('token')
-	if not token:
-		return Response({ 'data': 'Invalid parameters', 'status': False })
 	location = request.data.get('location')
-	if not location:
+	try:
+		around = geo.around(request.data)
+	except ValueError:
+		return Response({ 'data': 'Invalid parameters', 'status': False })
+	if not location and not around:
 		return Response({ 'data': 'Fields are required', 'status': False })
 	last_24_hours = timezone.now() - timedelta(hours=24)
-	recent_reports = Report.objects.filter(
-		location__icontains=location,
-		timestamp__gte=last_24_hours,
-		status='active'
-	)
+	recent_reports = Report.objects.filter(timestamp__gte=last_24_hours, status='active')
+	if around:
+		recent_reports = geo.near(recent_reports, *around)
+	else:
+		try:
+			label_location(recent_reports, location)
+		except Overloaded:
+			# Still busy, answer from the counters as they are
+			pass
+		positive, negative = LocationSentiment.objects.totals(location)
+		if positive or negative:
+			return Response({ 'data': majority(positive, negative), 'status': True })
+		# No counters for this exact location, search the reports themselves
+		recent_reports = recent_reports.filter(location__icontains=location)
 	if not recent_reports.exists():
 		return Response({ 'data': 'Not enough data', 'status': False })
-	reports_analysis = analysis(recent_reports)
+	try:
+		reports_analysis = analysis(recent_reports)
+	except Overloaded:
+		return Response({ 'data': 'Service is busy', 'status': False })
 	return Response({ 'data': reports_analysis, 'status': True })
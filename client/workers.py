@@ -0,0 +1,33 @@
+import os
+import threading
+
+# Create your workers here.
+class Worker:
+	# Runs self.run on a daemon thread, started on first use in every process.
+	# Subclasses set name, define run and create their per-process state in setup.
+	name = 'worker'
+
+	def __init__(self):
+		self.pid = None
+		self.start_lock = threading.Lock()
+
+	def setup(self):
+		pass
+
+	def start(self):
+		# A forked child inherits the state but not the worker thread, so start over
+		if self.pid == os.getpid():
+			return
+		with self.start_lock:
+			if self.pid == os.getpid():
+				return
+			self.setup()
+			self.thread = threading.Thread(target=self.run, name=self.name, daemon=True)
+			self.thread.start()
+			self.pid = os.getpid()
+
+	def started(self):
+		return self.pid == os.getpid()
+
+	def run(self):
+		raise NotImplementedError
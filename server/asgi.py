@@ -20,6 +20,14 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'server.settings')
 
 django_asgi_app = get_asgi_application()
 
+from django.conf import settings
+from client import sentiment
+
+if settings.SENTIMENT_PRELOAD:
+	sentiment.preload()
+if settings.SENTIMENT_WARM_UP:
+	sentiment.warm_up()
+
 application = ProtocolTypeRouter({
 	'http': django_asgi_app,
 	'websocket': AllowedHostsOriginValidator(AuthMiddlewareStack(URLRouter(websocket_urlpatterns))),
@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 import os
+import json
 import dj_database_url
 import cloudinary
 
@@ -186,3 +187,134 @@ CHANNEL_LAYERS = {
         },
     },
 }
+
+
+# Sentiment analysis
+# Descriptions are classified in batches sorted by length; inputs longer than
+# SENTIMENT_MAX_LENGTH tokens are truncated. The model is loaded on first use,
+# SENTIMENT_PRELOAD loads it when the ASGI/WSGI application is imported (before
+# workers fork) and SENTIMENT_WARM_UP also runs a first inference there.
+# Requests are queued and classified together: a batch is run once it holds
+# SENTIMENT_MAX_BATCH_SIZE descriptions or after SENTIMENT_MAX_WAIT_MS, and new
+# work is rejected while SENTIMENT_MAX_QUEUE_SIZE descriptions are waiting.
+# SENTIMENT_QUANTIZE loads a dynamically int8-quantized copy of the model, kept
+# in SENTIMENT_CACHE_DIR after the first load.
+
+SENTIMENT_MODEL = os.environ.get('SENTIMENT_MODEL', 'distilbert-base-uncased-finetuned-sst-2-english')
+SENTIMENT_BATCH_SIZE = int(os.environ.get('SENTIMENT_BATCH_SIZE', 32))
+SENTIMENT_MAX_LENGTH = int(os.environ.get('SENTIMENT_MAX_LENGTH', 512))
+SENTIMENT_MAX_BATCH_SIZE = int(os.environ.get('SENTIMENT_MAX_BATCH_SIZE', SENTIMENT_BATCH_SIZE))
+SENTIMENT_MAX_WAIT_MS = int(os.environ.get('SENTIMENT_MAX_WAIT_MS', 5))
+SENTIMENT_MAX_QUEUE_SIZE = int(os.environ.get('SENTIMENT_MAX_QUEUE_SIZE', 1024))
+SENTIMENT_PRELOAD = os.environ.get('SENTIMENT_PRELOAD', 'false').lower() == 'true'
+SENTIMENT_WARM_UP = os.environ.get('SENTIMENT_WARM_UP', 'false').lower() == 'true'
+SENTIMENT_QUANTIZE = os.environ.get('SENTIMENT_QUANTIZE', 'false').lower() == 'true'
+SENTIMENT_CACHE_DIR = os.environ.get('SENTIMENT_CACHE_DIR', os.path.join(BASE_DIR, '.cache', 'sentiment'))
+
+
+# Cache
+# Redis when REDIS_URL is set, otherwise a per-process local-memory cache.
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ.get('REDIS_URL'),
+    } if os.environ.get('REDIS_URL') else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+}
+
+
+# Feed updates
+# Websocket clients reconnecting with ?since=<seq> are replayed the events they
+# missed, or sent a fresh snapshot when more than FEED_REPLAY_LIMIT are missing.
+
+FEED_REPLAY_LIMIT = int(os.environ.get('FEED_REPLAY_LIMIT', 500))
+
+# The rendered 24h feeds are cached for FEED_CACHE_TTL seconds and dropped on
+# every write. With the local-memory cache a write only reaches the process
+# that made it, the others catch up when their copy expires.
+
+FEED_CACHE_TTL = int(os.environ.get('FEED_CACHE_TTL', 30))
+
+
+# Pagination
+# Lists are paged newest first with a cursor; clients pick ?page-size= up to
+# MAX_PAGE_SIZE.
+
+PAGE_SIZE = int(os.environ.get('PAGE_SIZE', 20))
+MAX_PAGE_SIZE = int(os.environ.get('MAX_PAGE_SIZE', 100))
+
+
+# Nearby reports
+# Radius in km used by explore and the feeds when a position is given without
+# ?radius=.
+
+NEARBY_RADIUS = float(os.environ.get('NEARBY_RADIUS', 2))
+
+
+# Token authentication
+# Resolved tokens are kept in a per-process LRU of TOKEN_CACHE_SIZE entries for
+# TOKEN_CACHE_TTL seconds. Rotating or deleting a token drops it at once in
+# the process that did it, other processes notice within the TTL.
+
+TOKEN_CACHE_SIZE = int(os.environ.get('TOKEN_CACHE_SIZE', 4096))
+TOKEN_CACHE_TTL = int(os.environ.get('TOKEN_CACHE_TTL', 60))
+
+
+# Bulk ingestion
+# submit-reports/ takes up to INGEST_MAX_BATCH reports per request, written with
+# one bulk insert, one notification and one feed update.
+
+INGEST_MAX_BATCH = int(os.environ.get('INGEST_MAX_BATCH', 500))
+
+
+# Streaming ingestion
+# ws/ingest/ buffers readings and writes them INGEST_FLUSH_SIZE at a time, or
+# after INGEST_FLUSH_MS when fewer arrive. A device may have INGEST_CREDIT
+# readings unacknowledged; acks hand the credit back, so a slow database slows
+# the devices down instead of growing the buffers.
+
+INGEST_FLUSH_SIZE = int(os.environ.get('INGEST_FLUSH_SIZE', 200))
+INGEST_FLUSH_MS = int(os.environ.get('INGEST_FLUSH_MS', 250))
+INGEST_CREDIT = int(os.environ.get('INGEST_CREDIT', 1000))
+
+
+# Sensor series
+# Numeric readings sent as sensor-series are stored packed (float32 values,
+# delta-encoded timestamps) and shipped in feeds as SENSOR_SUMMARY_POINTS
+# min/max/mean windows per channel; sensor-series/ returns the raw samples.
+
+SENSOR_SUMMARY_POINTS = int(os.environ.get('SENSOR_SUMMARY_POINTS', 60))
+
+
+# Report expiry
+# expire_reports marks active reports expired REPORT_TTL_HOURS after they were
+# submitted, or after the hours given for their type in REPORT_TTL_BY_TYPE,
+# e.g. REPORT_TTL_BY_TYPE='{"traffic": 2, "noise": 1}'.
+
+REPORT_TTL_HOURS = float(os.environ.get('REPORT_TTL_HOURS', 24))
+REPORT_TTL_BY_TYPE = {
+    report_type: float(hours)
+    for report_type, hours in json.loads(os.environ.get('REPORT_TTL_BY_TYPE', '{}')).items()
+}
+
+
+# Archival
+# archive_records moves reports, predictions and notifications older than
+# ARCHIVE_AFTER_DAYS, with every row that depends on them, into ArchivedRecord.
+# Feed events older than FEED_EVENT_RETENTION_HOURS are deleted; clients that
+# far behind get a snapshot anyway.
+
+ARCHIVE_AFTER_DAYS = int(os.environ.get('ARCHIVE_AFTER_DAYS', 30))
+FEED_EVENT_RETENTION_HOURS = int(os.environ.get('FEED_EVENT_RETENTION_HOURS', 24))
+
+
+# Broadcasts
+# Feed events and notifications for a websocket group are held until
+# BROADCAST_WINDOW_MS pass without another one, but no longer than
+# BROADCAST_MAX_LATENCY_MS, and then sent as one frame. 0 sends at once.
+
+BROADCAST_WINDOW_MS = int(os.environ.get('BROADCAST_WINDOW_MS', 200))
+BROADCAST_MAX_LATENCY_MS = int(os.environ.get('BROADCAST_MAX_LATENCY_MS', 1000))
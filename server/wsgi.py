@@ -14,3 +14,11 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'server.settings')
 
 application = get_wsgi_application()
+
+from django.conf import settings
+from client import sentiment
+
+if settings.SENTIMENT_PRELOAD:
+	sentiment.preload()
+if settings.SENTIMENT_WARM_UP:
+	sentiment.warm_up()